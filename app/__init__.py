@@ -15,20 +15,24 @@ csrf = CSRFProtect()
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
 
 def create_app():
     app = Flask(__name__)
 
+    # Logging goes through a queue to a background thread; LOG_FORMAT is text or json
+    app.config["LOG_LEVEL"] = os.getenv("LOG_LEVEL", "INFO").upper()
+    app.config["LOG_FORMAT"] = os.getenv("LOG_FORMAT", "text")
+    app.config["LOG_QUEUE_SIZE"] = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Request ids are read from (when a proxy sets it) and returned in this header
+    app.config["REQUEST_ID_HEADER"] = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+    from app.logs import init_logging
+
+    init_logging(app)
+
     # Configuration
     secret_key = os.getenv("SECRET_KEY")
     if not secret_key or secret_key == "dev-secret-key-change-in-production":
@@ -41,6 +45,28 @@ def create_app():
         "sqlite:////app/data/secretsanta.db",
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Create tables and apply migrations at startup when the schema is behind
+    app.config["AUTO_MIGRATE"] = os.getenv("AUTO_MIGRATE", "True") == "True"
+
+    # SQLite tuning for several workers sharing one database file
+    app.config["SQLITE_JOURNAL_MODE"] = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    app.config["SQLITE_MMAP_SIZE"] = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+    app.config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", "5"))
+    app.config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    app.config["DB_POOL_TIMEOUT"] = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    app.config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+    app.config["DB_POOL_PRE_PING"] = os.getenv("DB_POOL_PRE_PING", "False") == "True"
+    # Rate-limit counters shared by all workers (defaults to a file next to the database)
+    from app.ratelimit import default_storage_uri
+
+    app.config["RATELIMIT_STORAGE_URI"] = os.getenv(
+        "RATELIMIT_STORAGE_URI", default_storage_uri(app.config["SQLALCHEMY_DATABASE_URI"])
+    )
+    app.config["REGISTER_RATE_LIMIT"] = os.getenv("REGISTER_RATE_LIMIT", "10 per minute")
+    # Group concurrent signups into one transaction within this many ms (0 = off)
+    app.config["REGISTER_GROUP_COMMIT_MS"] = float(os.getenv("REGISTER_GROUP_COMMIT_MS", "0"))
     app.config["ADMIN_PASSWORD_HASH"] = os.getenv(
         "ADMIN_PASSWORD_HASH",
         "",
@@ -57,8 +83,57 @@ def create_app():
     app.config["SMTP_PORT"] = int(os.getenv("SMTP_PORT", "587"))
     app.config["SMTP_USERNAME"] = os.getenv("SMTP_USERNAME", "")
     app.config["SMTP_PASSWORD"] = os.getenv("SMTP_PASSWORD", "")
+    app.config["SMTP_STARTTLS"] = os.getenv("SMTP_STARTTLS", "True") == "True"
+    app.config["SMTP_TIMEOUT"] = int(os.getenv("SMTP_TIMEOUT", "30"))
+    # Connections are recycled after this many messages (relays cap messages per session)
+    app.config["SMTP_MAX_MESSAGES_PER_CONNECTION"] = int(
+        os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")
+    )
+    # Parallel SMTP connections used by the email worker, and messages per second (0 = no limit)
+    app.config["SMTP_CONCURRENCY"] = int(os.getenv("SMTP_CONCURRENCY", "1"))
+    app.config["SMTP_RATE_LIMIT"] = float(os.getenv("SMTP_RATE_LIMIT", "0"))
+
+    # Retries of temporary delivery failures: attempts per email, then exponential backoff
+    # (with jitter) starting at the base delay and capped at the max
+    app.config["EMAIL_MAX_ATTEMPTS"] = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+    app.config["EMAIL_RETRY_BASE_SECONDS"] = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+    app.config["EMAIL_RETRY_MAX_SECONDS"] = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+
+    # Where the email worker hands messages: smtp, maildir, mbox, null or memory
+    app.config["MAIL_TRANSPORT"] = os.getenv("MAIL_TRANSPORT", "smtp")
+    # Maildir directory or mbox file (default: mail/ or mail.mbox next to the database)
+    app.config["MAIL_FILE_PATH"] = os.getenv("MAIL_FILE_PATH", "")
+    # Add an HTML alternative (templates/email/*.html) to every email
+    app.config["EMAIL_HTML"] = os.getenv("EMAIL_HTML", "False") == "True"
+
+    # Gzip HTML responses larger than COMPRESS_MIN_SIZE bytes for browsers that accept it.
+    # Off by default; even when on, pages with CSRF tokens and admin pages are never
+    # compressed (BREACH)
+    app.config["COMPRESS_HTML"] = os.getenv("COMPRESS_HTML", "False") == "True"
+    app.config["COMPRESS_LEVEL"] = int(os.getenv("COMPRESS_LEVEL", "6"))
+    app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+    # Answer repeat visits with 304 and reuse rendered page fragments until the event changes
+    app.config["PAGE_CACHE"] = os.getenv("PAGE_CACHE", "True") == "True"
+
+    # Per-request SQL statement counter (on by default in debug mode)
+    app.config["SQL_QUERY_COUNTER"] = os.getenv("SQL_QUERY_COUNTER", str(app.debug)) == "True"
+    app.config["SQL_QUERY_WARN_THRESHOLD"] = int(os.getenv("SQL_QUERY_WARN_THRESHOLD", "20"))
 
+    # Metrics from every worker process are merged through files in this directory
+    from app.database import data_directory
+
+    default_metrics_dir = data_directory(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["METRICS_DIR"] = os.getenv(
+        "METRICS_DIR", os.path.join(default_metrics_dir, "metrics") if default_metrics_dir else ""
+    )
+    # Lets a Prometheus scraper read /admin/metrics with "Authorization: Bearer <token>"
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN", "")
+
+    from app.database import engine_options, init_sqlite_tuning
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app)
     db.init_app(app)
+    init_sqlite_tuning(app)
     csrf.init_app(app)
     limiter.init_app(app)
 
@@ -67,8 +142,24 @@ def create_app():
 
     app.register_blueprint(main)
 
-    # Create database tables
+    from app.assets import init_assets
+
+    init_assets(app)
+
+    from app.instrumentation import init_query_counter, init_request_metrics
+
+    init_query_counter(app)
+    init_request_metrics(app)
+
+    from app.cli import register_commands
+
+    register_commands(app)
+
+    # Only the schema version is read here; tables and migrations come from
+    # `flask --app app migrate`, or automatically while AUTO_MIGRATE is on
+    from app.schema import ensure_schema
+
     with app.app_context():
-        db.create_all()
+        ensure_schema(db.engine, auto_migrate=app.config["AUTO_MIGRATE"])
 
     return app
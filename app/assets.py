@@ -0,0 +1,161 @@
+"""Static assets: fingerprinted, precompressed files and gzipped HTML responses.
+
+``flask --app app build-assets`` copies every file under ``app/static`` into
+``app/static/dist`` with a content hash in its name (``css/app.3f2a9c1e04b7.css``),
+next to ``.gz`` and (with the optional ``brotli`` package) ``.br`` versions, and
+writes ``manifest.json``. Templates link assets with ``asset_url('css/app.css')``,
+which points at the fingerprinted copy when the manifest exists and at the plain
+file otherwise. A fingerprinted file never changes, so it is served with an
+immutable one-year cache lifetime, in the best encoding the browser accepts.
+
+With ``COMPRESS_HTML`` on, HTML responses are gzipped on the fly, except pages
+that carry a secret an attacker could guess through the compressed size (BREACH):
+anything with a CSRF token, and every page an admin sees.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, g, request, send_from_directory, session, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: pip install "secretsantabot[assets]"
+    brotli = None
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+# Fingerprinted files are only ever replaced under a new name, never modified
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Precompressed variants in order of preference: (Accept-Encoding token, file suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt")
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build_assets(static_folder):
+    """Write fingerprinted, precompressed copies of the static files; returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+
+            stem, ext = os.path.splitext(path)
+            fingerprinted = f"{DIST_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            target = os.path.join(static_folder, fingerprinted)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write(target, data)
+            if ext in COMPRESSIBLE_EXTENSIONS:
+                _write(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(target + ".br", brotli.compress(data, quality=11))
+            manifest[path] = fingerprinted
+
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _manifest():
+    """The app's manifest, read on first use so it follows ``static_folder``."""
+    manifest = current_app.extensions.get("asset_manifest")
+    if manifest is None:
+        manifest = load_manifest(current_app.static_folder)
+        current_app.extensions["asset_manifest"] = manifest
+    return manifest
+
+
+def _send_fingerprinted(filename):
+    """Serve a fingerprinted file, precompressed if possible, with immutable caching."""
+    folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    for token, suffix in ENCODINGS:
+        if request.accept_encodings[token] and os.path.isfile(
+            os.path.join(folder, filename + suffix)
+        ):
+            response = send_from_directory(
+                folder, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+            )
+            response.headers["Content-Encoding"] = token
+            break
+    else:
+        response = send_from_directory(
+            folder, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+        )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _has_secrets():
+    """Whether this response may hold a CSRF token or admin-only data."""
+    field_name = current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token")
+    # generate_csrf() leaves the token in g once a template has rendered it
+    return field_name in g or session.get("admin_authenticated", False)
+
+
+def _compress_html(response):
+    """Gzip HTML pages without secrets for browsers that accept it."""
+    if (
+        response.mimetype != "text/html"
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or _has_secrets()
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config["COMPRESS_MIN_SIZE"]:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=current_app.config["COMPRESS_LEVEL"]))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+def init_assets(app):
+    """Add ``asset_url`` to templates, serve built assets and compress HTML."""
+
+    @app.template_global()
+    def asset_url(path):
+        return url_for("static", filename=_manifest().get(path, path))
+
+    serve_static = app.view_functions["static"]
+
+    def static(filename):
+        if filename.startswith(f"{DIST_DIR}/"):
+            return _send_fingerprinted(filename)
+        return serve_static(filename=filename)
+
+    app.view_functions["static"] = static
+
+    if app.config["COMPRESS_HTML"]:
+        app.after_request(_compress_html)
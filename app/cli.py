@@ -0,0 +1,72 @@
+"""Flask CLI commands (run with ``flask --app app <command>``)."""
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.importer import FORMATS, IMPORT_CHUNK_SIZE, detect_format, import_participants
+
+
+def register_commands(app):
+    app.cli.add_command(import_participants_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(build_assets_command)
+
+
+@click.command("migrate")
+@click.option("--check", is_flag=True, help="Only report the version; exit 1 if it is behind")
+@with_appcontext
+def migrate_command(check):
+    """Create missing tables and apply pending schema migrations."""
+    from app import db
+    from app.schema import SCHEMA_VERSION, get_version, migrate
+
+    if check:
+        with db.engine.connect() as connection:
+            version = get_version(connection)
+        click.echo(f"Database schema is at version {version} (current: {SCHEMA_VERSION})")
+        if version < SCHEMA_VERSION:
+            raise SystemExit(1)
+        return
+
+    version = migrate(db.engine)
+    click.echo(f"Database schema is at version {version}")
+
+
+@click.command("import-participants")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format", "fmt", type=click.Choice(FORMATS), help="File format (default: from extension)"
+)
+@click.option("--chunk-size", default=IMPORT_CHUNK_SIZE, show_default=True, type=int)
+@with_appcontext
+def import_participants_command(path, fmt, chunk_size):
+    """Import participants from a CSV or JSONL file, streaming it row by row."""
+    from app.phase import REGISTRATION, current_phase
+
+    # Imported participants are not spliced one by one; match them all at once afterwards
+    if current_phase() != REGISTRATION:
+        raise click.ClickException("Clear the existing matches before importing participants.")
+
+    fmt = fmt or detect_format(path)
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        report = import_participants(stream, fmt, chunk_size=chunk_size)
+
+    click.echo(report.summary())
+    for line, message in report.errors:
+        click.echo(f"  line {line}: {message}", err=True)
+    if report.error_count > len(report.errors):
+        click.echo(f"  ... and {report.error_count - len(report.errors)} more", err=True)
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Write fingerprinted, precompressed copies of the static files to app/static/dist."""
+    from app.assets import brotli, build_assets
+
+    manifest = build_assets(current_app.static_folder)
+    for path, built in manifest.items():
+        click.echo(f"{path} -> {built}")
+    if brotli is None:
+        click.echo("brotli is not installed; wrote gzip versions only", err=True)
@@ -0,0 +1,66 @@
+"""SQLite connection tuning for several gunicorn workers sharing one database file.
+
+Every new DB-API connection gets the configured PRAGMAs through a SQLAlchemy
+``connect`` event. WAL lets readers keep going while one worker writes, and
+``busy_timeout`` makes a writer wait for the lock instead of failing with
+"database is locked".
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import db
+
+
+def _is_memory_database(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def data_directory(uri):
+    """Directory holding a SQLite database file, for files that sit next to it (or None)."""
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite" or _is_memory_database(uri):
+        return None
+    return os.path.dirname(os.path.abspath(url.database))
+
+
+def engine_options(app):
+    """Pool settings for ``SQLALCHEMY_ENGINE_OPTIONS`` (not used for in-memory SQLite)."""
+    if _is_memory_database(app.config["SQLALCHEMY_DATABASE_URI"]):
+        return {}
+    return {
+        "pool_size": app.config["DB_POOL_SIZE"],
+        "max_overflow": app.config["DB_MAX_OVERFLOW"],
+        "pool_timeout": app.config["DB_POOL_TIMEOUT"],
+        "pool_recycle": app.config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": app.config["DB_POOL_PRE_PING"],
+    }
+
+
+def sqlite_pragmas(config):
+    return [
+        f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+
+def init_sqlite_tuning(app):
+    """Apply the configured PRAGMAs to every connection the app's engine opens."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
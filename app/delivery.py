@@ -0,0 +1,133 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.mailer import describe_smtp_error
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how many messages leave per second.
+
+    A ``rate`` of 0 (or less) disables limiting. Callers reserve a token and
+    sleep outside the lock, so waiting threads don't block each other.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay:
+            self._sleep(delay)
+
+
+def retry_delay(attempts, base, cap, rand=random.random):
+    """Seconds to wait before retrying a message that has failed ``attempts`` times.
+
+    The delay doubles with every attempt up to ``cap``, and half of it is
+    random so messages that failed together (a throttled relay) don't all
+    come back at the same moment.
+    """
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + rand() * delay / 2
+
+
+class DeliveryReport:
+    """Running tally of a delivery pass, summarised the way the admin sees it."""
+
+    def __init__(self):
+        self.sent = 0
+        self.retrying = 0
+        self.failed = 0
+        self.first_error = None
+
+    def record(self, error=None, retry=False):
+        if error is None:
+            self.sent += 1
+            return
+        if retry:
+            self.retrying += 1
+        else:
+            self.failed += 1
+        if self.first_error is None:
+            self.first_error = describe_smtp_error(error)
+
+    def summary(self):
+        parts = []
+        if self.sent:
+            parts.append(f"Successfully sent {self.sent} emails!")
+        if self.retrying:
+            parts.append(f"Will retry {self.retrying} emails later.")
+        if self.failed:
+            parts.append(f"Failed to send {self.failed} emails.")
+        if self.first_error:
+            parts.append(self.first_error)
+        return " ".join(parts)
+
+
+class DeliveryEngine:
+    """Sends messages over several connections in parallel under a shared rate limit.
+
+    ``send`` is called from worker threads and must be thread-safe (an
+    ``SMTPPool`` sized to ``concurrency`` is). ``run`` yields ``(key, error)``
+    for each message as soon as it finishes, in the caller's thread, so the
+    caller can record progress with its own database session.
+    """
+
+    def __init__(self, send, concurrency=1, rate=0):
+        self.send = send
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate)
+
+    def _deliver(self, key, msg):
+        self.bucket.acquire()
+        try:
+            self.send(msg)
+        except Exception as e:
+            return key, e
+        return key, None
+
+    def run(self, jobs):
+        """Deliver ``(key, message)`` pairs, yielding ``(key, error)`` as each completes."""
+        # Keep a bounded number of messages in flight so huge batches stay cheap
+        max_in_flight = self.concurrency * 2
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="delivery"
+        ) as executor:
+            in_flight = set()
+            for key, msg in jobs:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                in_flight.add(executor.submit(self._deliver, key, msg))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+
+def get_engine(app, transport):
+    """Build a delivery engine for ``transport`` using the app's concurrency and rate settings."""
+    return DeliveryEngine(
+        transport.send,
+        concurrency=app.config.get("SMTP_CONCURRENCY", 1),
+        rate=app.config.get("SMTP_RATE_LIMIT", 0),
+    )
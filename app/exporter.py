@@ -0,0 +1,109 @@
+"""Streaming CSV/JSONL export of participants and matches.
+
+Rows are pulled from the database ``EXPORT_BATCH_SIZE`` at a time
+(``yield_per``) as plain column tuples and encoded as they arrive, so memory
+stays flat however big the event is. The header goes out before the query
+runs, so the first byte reaches the client straight away.
+
+Names and gift preferences come from the public registration form, so CSV
+cells that a spreadsheet would read as a formula are prefixed with ``'``.
+"""
+
+import csv
+import io
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Match, Participant
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+# Rows fetched from the database and encoded per chunk of output
+EXPORT_BATCH_SIZE = 1000
+# Leading characters that make Excel, LibreOffice or Sheets evaluate a cell
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+PARTICIPANT_FIELDS = ("id", "name", "email", "gift_preference", "created_at")
+MATCH_FIELDS = (
+    "giver_name",
+    "giver_email",
+    "receiver_name",
+    "receiver_email",
+    "email_sent",
+    "revealed",
+)
+
+
+def participants_query():
+    return select(
+        Participant.id,
+        Participant.name,
+        Participant.email,
+        Participant.gift_preference,
+        Participant.created_at,
+    ).order_by(Participant.id)
+
+
+def matches_query():
+    giver, receiver = aliased(Participant), aliased(Participant)
+    return (
+        select(
+            giver.name,
+            giver.email,
+            receiver.name,
+            receiver.email,
+            Match.email_sent,
+            Match.revealed,
+        )
+        .join(giver, Match.giver_id == giver.id)
+        .join(receiver, Match.receiver_id == receiver.id)
+        .order_by(Match.id)
+    )
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _csv_value(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_rows(query, fields, fmt):
+    """Yield the encoded export chunk by chunk: the header first, then one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+
+    def drain():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    if writer:
+        writer.writerow(fields)
+        yield drain()
+
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for rows in result.partitions():
+        if writer:
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+        else:
+            for row in rows:
+                record = {
+                    field: _json_value(value) for field, value in zip(fields, row, strict=True)
+                }
+                buffer.write(json.dumps(record) + "\n")
+        yield drain()
+
+
+def export_participants(fmt):
+    return stream_rows(participants_query(), PARTICIPANT_FIELDS, fmt)
+
+
+def export_matches(fmt):
+    return stream_rows(matches_query(), MATCH_FIELDS, fmt)
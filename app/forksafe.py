@@ -0,0 +1,38 @@
+"""Start background threads once per process, including forked gunicorn workers.
+
+Threads don't survive a fork: a worker forked from a master that already started
+one inherits the objects but not the thread. The log listener, the metrics
+flusher and the group committer are therefore started lazily on first use, and
+started again the first time they are used in a new process.
+"""
+
+import os
+import threading
+
+
+class PerProcess:
+    """Calls ``start`` the first time ``ensure()`` runs in each process.
+
+    ``start`` runs under a lock, so concurrent first calls start one thread, and
+    should set up fresh per-process state (queues, files) before starting it.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.start()
+                self._pid = os.getpid()
+
+    def reset(self, stop=None):
+        """Forget the thread; ``stop`` is called first if it was started in this process."""
+        with self._lock:
+            if stop is not None and self._pid == os.getpid():
+                stop()
+            self._pid = None
@@ -0,0 +1,106 @@
+"""Group commit for registrations: concurrent signups share one SQLite transaction.
+
+With ``REGISTER_GROUP_COMMIT_MS`` above 0, request threads hand their new
+participant to a per-process committer thread. It waits up to that many
+milliseconds for more signups and writes the whole group in one transaction
+(one write lock, one fsync), then wakes each request with its result.
+
+This pays off when a process serves several requests at once (gunicorn
+``--threads``); with one request per process it only adds latency.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy.dialects.sqlite import insert
+
+from app import db, metrics
+from app.forksafe import PerProcess
+from app.models import Participant
+
+logger = logging.getLogger(__name__)
+
+# Most signups written in one transaction
+MAX_BATCH = 200
+# How long a request waits for its group to commit before giving up
+RESULT_TIMEOUT_SECONDS = 30
+
+_create_lock = threading.Lock()
+
+
+class GroupCommitter:
+    """Collects participant rows from request threads and inserts them in groups."""
+
+    def __init__(self, engine, window, max_batch=MAX_BATCH):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._per_process = PerProcess(self._start_thread)
+
+    def _start_thread(self):
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="group-commit", daemon=True).start()
+
+    def submit(self, values):
+        """Queue a participant row; the future resolves to its id, or None if the email is taken."""
+        self._per_process.ensure()
+        future = Future()
+        self._queue.put((values, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        table = Participant.__table__
+        # Duplicates (already registered, or twice in this group) insert nothing and return no id
+        statement = (
+            insert(table).on_conflict_do_nothing(index_elements=["email"]).returning(table.c.id)
+        )
+        try:
+            with self.engine.begin() as connection:
+                ids = [connection.execute(statement, values).scalar() for values, _ in batch]
+        except Exception as e:
+            logger.error("Group commit of %d registrations failed: %s", len(batch), e)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        metrics.observe("secretsanta_group_commit_size", len(batch))
+        for (_, future), participant_id in zip(batch, ids, strict=True):
+            future.set_result(participant_id)
+
+
+def get_committer(app):
+    """Return the group committer for ``app``, creating it on first use."""
+    committer = app.extensions.get("group_commit")
+    if committer is None:
+        with _create_lock:
+            committer = app.extensions.get("group_commit")
+            if committer is None:
+                committer = app.extensions["group_commit"] = GroupCommitter(
+                    db.engine, app.config["REGISTER_GROUP_COMMIT_MS"] / 1000
+                )
+    return committer
+
+
+def register(app, name, email, gift_preference):
+    """Insert a participant through the group committer; False if the email is taken."""
+    future = get_committer(app).submit(
+        {"name": name, "email": email, "gift_preference": gift_preference}
+    )
+    return future.result(timeout=RESULT_TIMEOUT_SECONDS) is not None
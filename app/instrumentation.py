@@ -0,0 +1,85 @@
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app import db, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _before_statement(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context: a statement that raises never reaches
+    # after_cursor_execute, so anything stored on the connection would pile up
+    context._statement_start = time.perf_counter()
+
+
+def _after_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._statement_start
+    metrics.observe("secretsanta_sql_statement_duration_seconds", elapsed)
+    if has_request_context():
+        g.sql_statement_count = g.get("sql_statement_count", 0) + 1
+        g.sql_seconds = g.get("sql_seconds", 0.0) + elapsed
+
+
+def init_query_counter(app):
+    """Time every SQL statement and log how many each request ran.
+
+    Timings feed the metrics endpoint. The per-request log line is enabled in
+    debug mode by default; requests that run more than
+    ``SQL_QUERY_WARN_THRESHOLD`` statements are logged as warnings, which is
+    usually an N+1 query creeping back in.
+    """
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_statement)
+        event.listen(db.engine, "after_cursor_execute", _after_statement)
+
+    if not app.config["SQL_QUERY_COUNTER"]:
+        return
+
+    threshold = app.config["SQL_QUERY_WARN_THRESHOLD"]
+
+    @app.after_request
+    def log_statement_count(response):
+        count = g.get("sql_statement_count", 0)
+        level = logging.WARNING if count > threshold else logging.INFO
+        logger.log(level, "%s %s ran %d SQL statements", request.method, request.path, count)
+        return response
+
+
+def init_request_metrics(app):
+    """Record latency, status and SQL cost per endpoint for every request."""
+    metrics.registry.configure(app.config["METRICS_DIR"])
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        # Label by endpoint name, not path, so ids in URLs don't create new series
+        endpoint = request.endpoint or "unmatched"
+        metrics.observe(
+            "secretsanta_request_duration_seconds",
+            time.perf_counter() - start,
+            endpoint=endpoint,
+        )
+        metrics.inc(
+            "secretsanta_requests_total",
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+        )
+        metrics.observe(
+            "secretsanta_request_sql_statements",
+            g.get("sql_statement_count", 0),
+            endpoint=endpoint,
+        )
+        metrics.observe(
+            "secretsanta_request_sql_seconds", g.get("sql_seconds", 0.0), endpoint=endpoint
+        )
+        return response
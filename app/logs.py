@@ -0,0 +1,168 @@
+"""Logging: records are queued by the caller and written by a background thread.
+
+``init_logging`` (called first thing in ``create_app``) puts one handler on the
+root logger. It resolves each record's message in the calling thread and hands
+it to a queue; a listener thread formats it, as text or one JSON object per
+line (``LOG_FORMAT``), and writes it to stderr. A slow log sink therefore never
+holds up a request. If the queue fills up (``LOG_QUEUE_SIZE``) further records
+are dropped and counted in ``secretsanta_log_records_dropped_total``.
+
+Every request gets an id, taken from the ``REQUEST_ID_HEADER`` header when a
+proxy sets one and generated otherwise. It is added to each record logged while
+handling the request and returned in the response header.
+
+Pass arguments to the logger instead of building the message first
+(``logger.info("Registered %s", email)``), so nothing is formatted for records
+below ``LOG_LEVEL``.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import secrets
+import sys
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+from app import metrics
+from app.forksafe import PerProcess
+
+FORMATS = ("text", "json")
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+# Incoming request ids are passed through only if they look like one
+REQUEST_ID_PATTERN = re.compile(r"[\w.:-]{1,64}")
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "request_id",
+}
+
+_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with any ``extra=`` fields alongside."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records with the id of the request being handled ("-" outside requests)."""
+
+    def filter(self, record):
+        record.request_id = g.get("request_id", "-") if has_request_context() else "-"
+        return True
+
+
+class QueueLogHandler(QueueHandler):
+    """Queues records for a listener thread that formats and writes them."""
+
+    def __init__(self, target, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self._listener = None
+        self._per_process = PerProcess(self._start_listener)
+
+    def _start_listener(self):
+        self.queue = queue.Queue(self.maxsize)
+        self._listener = QueueListener(self.queue, self.target)
+        self._listener.start()
+
+    def prepare(self, record):
+        # Resolve the message and traceback while the arguments are still valid;
+        # the formatter and the write run on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._per_process.ensure()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("secretsanta_log_records_dropped_total")
+
+    def close(self):
+        """Write out whatever is still queued and stop the listener."""
+        if self._listener is not None:
+            self._per_process.reset(stop=self._listener.stop)
+        self._listener = None
+        super().close()
+
+
+def _stop():
+    if _handler is not None:
+        _handler.close()
+
+
+def init_logging(app):
+    """Route all logging through a queue and tag records with request ids."""
+    global _handler
+
+    if app.config["LOG_FORMAT"] not in FORMATS:
+        raise ValueError(f"LOG_FORMAT must be one of {', '.join(FORMATS)}")
+
+    target = logging.StreamHandler(sys.stderr)
+    if app.config["LOG_FORMAT"] == "json":
+        target.setFormatter(JSONFormatter())
+    else:
+        target.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    handler = QueueLogHandler(target, app.config["LOG_QUEUE_SIZE"])
+    handler.addFilter(RequestIdFilter())
+
+    # Replace the handler from an earlier create_app() in this process
+    root = logging.getLogger()
+    if _handler is None:
+        atexit.register(_stop)
+    else:
+        root.removeHandler(_handler)
+        _handler.close()
+    root.addHandler(handler)
+    root.setLevel(app.config["LOG_LEVEL"])
+    _handler = handler
+
+    header = app.config["REQUEST_ID_HEADER"]
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(header, "")
+        if REQUEST_ID_PATTERN.fullmatch(incoming):
+            g.request_id = incoming
+        else:
+            g.request_id = secrets.token_hex(8)
+
+    @app.after_request
+    def return_request_id(response):
+        if "request_id" in g:
+            response.headers[header] = g.request_id
+        return response
@@ -0,0 +1,276 @@
+import logging
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.charset import QP, Charset
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from flask import current_app
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _measure(operation):
+    """Time one SMTP operation for the metrics endpoint, counting failures."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.inc("secretsanta_smtp_errors_total", operation=operation)
+        raise
+    finally:
+        metrics.observe(
+            "secretsanta_smtp_duration_seconds",
+            time.perf_counter() - start,
+            operation=operation,
+        )
+
+
+class _Connection:
+    """An authenticated SMTP session and the number of messages sent over it."""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            # The server may already have dropped us; make sure the socket is gone
+            self.smtp.close()
+
+
+class SMTPPool:
+    """Keeps authenticated SMTP connections open for a whole batch of messages.
+
+    Connections are opened lazily, reused across sends and recycled after
+    ``max_messages`` messages (most relays cap messages per session). A send
+    that fails because the server dropped the connection is retried once on a
+    fresh connection.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        username="",
+        password="",
+        starttls=True,
+        timeout=30,
+        max_messages=100,
+        size=1,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, config, size=1):
+        return cls(
+            config["SMTP_SERVER"],
+            config["SMTP_PORT"],
+            username=config["SMTP_USERNAME"],
+            password=config["SMTP_PASSWORD"],
+            starttls=config.get("SMTP_STARTTLS", True),
+            timeout=config.get("SMTP_TIMEOUT", 30),
+            max_messages=config.get("SMTP_MAX_MESSAGES_PER_CONNECTION", 100),
+            size=size,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self):
+        with _measure("connect"):
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                with _measure("starttls"):
+                    smtp.starttls()
+            if self.username:
+                with _measure("login"):
+                    smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        logger.debug("Opened SMTP connection to %s:%s", self.host, self.port)
+        return _Connection(smtp)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        if self._closed or conn.sent >= self.max_messages:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def _reconnect(self, conn, msg, error):
+        conn.close()
+        logger.info("SMTP connection lost (%s), reconnecting", error)
+        conn = self._connect()
+        try:
+            with _measure("send"):
+                conn.smtp.send_message(msg)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def send(self, msg):
+        """Send one message, reconnecting once if the server dropped the session."""
+        if self._closed:
+            raise RuntimeError("SMTPPool is closed")
+
+        with self._slots:
+            conn = self._acquire()
+            try:
+                with _measure("send"):
+                    conn.smtp.send_message(msg)
+            except smtplib.SMTPServerDisconnected as e:
+                conn = self._reconnect(conn, msg, e)
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code != 421:
+                    # The message was rejected but the session is still usable
+                    self._release(conn)
+                    raise
+                conn = self._reconnect(conn, msg, e)
+            except smtplib.SMTPRecipientsRefused:
+                self._release(conn)
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            conn.sent += 1
+            self._release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _clean(value):
+    """Collapse whitespace so names can't inject extra headers or lines."""
+    return " ".join(value.split())
+
+
+# Subject and recipient ("giver" or "receiver") of each kind of email. Bodies live in
+# templates/email/<kind>.txt, plus <kind>.html for the optional HTML alternative.
+EMAILS = {
+    "match": ("Your Secret Santa Match!", "giver"),
+    "thank_you": ("Your Secret Santa is Revealed!", "receiver"),
+}
+
+
+# Non-ASCII bodies use quoted-printable so they stay readable in previews and raw mail
+_UTF8 = Charset("utf-8")
+_UTF8.body_encoding = QP
+
+
+def _text_part(body, subtype):
+    return MIMEText(body, subtype, "us-ascii" if body.isascii() else _UTF8)
+
+
+def _context(match):
+    giver = match.giver
+    receiver = match.receiver
+    return {
+        "giver_name": _clean(giver.name),
+        "giver_email": giver.email,
+        "receiver_name": _clean(receiver.name),
+        "gift_preference": _clean(receiver.gift_preference or "No preference specified"),
+    }
+
+
+def render_messages(jobs, sender, html=False):
+    """Render ``(key, kind, match)`` jobs into a list of ready ``(key, message)`` pairs.
+
+    Templates come from the app's Jinja environment, which compiles each one
+    once per process. Messages are single-part plain text, or
+    multipart/alternative with an HTML part when ``html`` is set. The whole
+    pass is recorded as ``secretsanta_email_render_seconds``.
+    """
+    env = current_app.jinja_env
+    templates = {}
+    messages = []
+    with metrics.timed("secretsanta_email_render_seconds"):
+        for key, kind, match in jobs:
+            if kind not in templates:
+                templates[kind] = (
+                    env.get_template(f"email/{kind}.txt"),
+                    env.get_template(f"email/{kind}.html") if html else None,
+                )
+            text_template, html_template = templates[kind]
+            subject, recipient = EMAILS[kind]
+            context = _context(match)
+
+            msg = _text_part(text_template.render(context) + "\n", "plain")
+            if html_template is not None:
+                alternative = MIMEMultipart("alternative")
+                alternative.attach(msg)
+                alternative.attach(_text_part(html_template.render(context), "html"))
+                msg = alternative
+            msg["From"] = sender
+            msg["To"] = getattr(match, recipient).email
+            msg["Subject"] = subject
+            messages.append((key, msg))
+    return messages
+
+
+def is_transient(error):
+    """Whether a delivery error is worth retrying later.
+
+    4xx replies (greylisting, throttling, a full mailbox) and dropped or
+    refused connections are temporary; 5xx replies such as an unknown
+    recipient, and anything else, are not.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+def describe_smtp_error(error):
+    """Turn a delivery exception into a hint the admin can act on."""
+    error_msg = str(error)
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return "SMTP authentication failed. Check SMTP_USERNAME and SMTP_PASSWORD in .env"
+    if "Connection refused" in error_msg:
+        return "Connection refused. Check SMTP_SERVER and SMTP_PORT in .env"
+    if "timed out" in error_msg:
+        return "Connection timeout. Check network/firewall settings"
+    if "Name or service not known" in error_msg:
+        return "Cannot resolve SMTP server hostname. Check SMTP_SERVER in .env"
+    if isinstance(error, smtplib.SMTPException):
+        return f"SMTP error: {error_msg}"
+    return f"Error: {error_msg}"
@@ -0,0 +1,215 @@
+"""Secret Santa matching: one gift-giving cycle through every participant.
+
+Everyone gives to the next person in the cycle and the last gives to the first,
+so there are never small closed loops (A->B, B->A). Exclusions are directed
+``(giver_id, receiver_id)`` pairs that must not appear in the cycle; use
+``exclusions_for_groups`` to keep partners or households from drawing each other.
+
+The search shuffles everyone into a cycle and then repairs excluded edges with
+local swaps, which takes a few milliseconds even for tens of thousands of
+people when exclusions are sparse. Small, heavily constrained events fall back
+to an exhaustive backtracking search, which can also prove that no valid cycle
+exists.
+"""
+
+import itertools
+import random
+
+# Largest event the exhaustive search is attempted for (it is O(n^2) to set up)
+EXACT_SEARCH_LIMIT = 2000
+# Nodes the exhaustive search may expand before giving up
+EXACT_SEARCH_BUDGET = 200_000
+
+
+class MatchingError(Exception):
+    """No valid set of matches could be found."""
+
+
+class NoValidCycleError(MatchingError):
+    """The exclusions make a valid set of matches impossible."""
+
+
+def exclusions_for_groups(groups):
+    """Yield both directions of every pair within each group (e.g. a household)."""
+    for group in groups:
+        yield from itertools.permutations(group, 2)
+
+
+def cycle_pairs(order):
+    """Yield ``(giver_id, receiver_id)`` for each edge of the cycle ``order``."""
+    for i, giver_id in enumerate(order):
+        yield giver_id, order[(i + 1) % len(order)]
+
+
+def find_cycle(participant_ids, excluded=(), rng=None, repair_steps=None):
+    """Return participant ids in giving order, avoiding every excluded pair.
+
+    Raises ``NoValidCycleError`` when the exclusions rule out every cycle and
+    ``MatchingError`` when the search gives up without finding one.
+    """
+    ids = list(participant_ids)
+    n = len(ids)
+    if n < 2:
+        raise NoValidCycleError("Need at least 2 participants to create matches")
+    members = set(ids)
+    if len(members) != n:
+        raise ValueError("Participant ids must be unique")
+
+    rng = rng or random.Random()
+    forbidden = {
+        (giver, receiver)
+        for giver, receiver in excluded
+        if giver != receiver and giver in members and receiver in members
+    }
+    _check_degrees(ids, forbidden)
+
+    order = _repair(ids, forbidden, rng, repair_steps or 100 * n + 10_000)
+    if order is None:
+        if n > EXACT_SEARCH_LIMIT:
+            raise MatchingError(
+                "Could not find matches that satisfy every exclusion; try removing some"
+            )
+        order = _search(ids, forbidden, rng)
+    return order
+
+
+def _check_degrees(ids, forbidden):
+    """Reject events where someone can't give to (or receive from) anyone."""
+    n = len(ids)
+    blocked_out = {}
+    blocked_in = {}
+    for giver, receiver in forbidden:
+        blocked_out[giver] = blocked_out.get(giver, 0) + 1
+        blocked_in[receiver] = blocked_in.get(receiver, 0) + 1
+
+    for participant_id, count in blocked_out.items():
+        if count >= n - 1:
+            raise NoValidCycleError(
+                f"Participant {participant_id} is excluded from giving to everyone else"
+            )
+    for participant_id, count in blocked_in.items():
+        if count >= n - 1:
+            raise NoValidCycleError(
+                f"Participant {participant_id} is excluded from receiving from everyone else"
+            )
+
+
+def _repair(ids, forbidden, rng, max_steps):
+    """Shuffle into a cycle, then swap people around until no edge is excluded."""
+    order = ids[:]
+    rng.shuffle(order)
+    if not forbidden:
+        return order
+
+    n = len(order)
+
+    def is_bad(k):
+        return (order[k], order[(k + 1) % n]) in forbidden
+
+    broken = {k for k in range(n) if is_bad(k)}
+    for _step in range(max_steps):
+        if not broken:
+            return order
+
+        # Move the receiver of a broken edge somewhere else in the cycle
+        k = rng.choice(tuple(broken)) if len(broken) < 64 else next(iter(broken))
+        p = (k + 1) % n
+        j = rng.randrange(n)
+        if j == p:
+            continue
+
+        affected = {(p - 1) % n, p, (j - 1) % n, j}
+        before = len(affected & broken)
+        order[p], order[j] = order[j], order[p]
+        now_bad = {a for a in affected if is_bad(a)}
+
+        # Accept sideways moves too so the search can walk off plateaus
+        if len(now_bad) > before:
+            order[p], order[j] = order[j], order[p]
+        else:
+            broken -= affected
+            broken |= now_bad
+
+    return order if not broken else None
+
+
+def _search(ids, forbidden, rng):
+    """Exhaustive backtracking search for a Hamiltonian cycle (small events only)."""
+    allowed = {
+        giver: [r for r in ids if r != giver and (giver, r) not in forbidden] for giver in ids
+    }
+    # Try the most constrained receivers first, breaking ties randomly
+    tie_break = {participant_id: rng.random() for participant_id in ids}
+    for giver in ids:
+        allowed[giver].sort(key=lambda r: (len(allowed[r]), tie_break[r]))
+
+    n = len(ids)
+    start = min(ids, key=lambda participant_id: len(allowed[participant_id]))
+    path = [start]
+    on_path = {start}
+    stack = [iter(allowed[start])]
+    expanded = 0
+
+    while stack:
+        receiver = next(stack[-1], None)
+        if receiver is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+        if receiver in on_path:
+            continue
+
+        expanded += 1
+        if expanded > EXACT_SEARCH_BUDGET:
+            raise MatchingError(
+                "Could not find matches that satisfy every exclusion; try removing some"
+            )
+
+        if len(path) == n - 1:
+            if (receiver, start) not in forbidden:
+                return path + [receiver]
+            continue
+
+        path.append(receiver)
+        on_path.add(receiver)
+        stack.append(iter(allowed[receiver]))
+
+    raise NoValidCycleError("No set of matches satisfies every exclusion")
+
+
+def choose_splice_edge(edges, new_id, excluded=(), rng=None):
+    """Pick an existing ``(giver, receiver)`` edge to route through ``new_id``.
+
+    The new participant is inserted as ``giver -> new_id -> receiver``, so
+    only the chosen edge's row changes and one new row is added.
+    """
+    rng = rng or random.Random()
+    forbidden = set(excluded)
+    candidates = [
+        (giver, receiver)
+        for giver, receiver in edges
+        if (giver, new_id) not in forbidden and (new_id, receiver) not in forbidden
+    ]
+    if not candidates:
+        raise MatchingError("No place in the existing matches fits the new participant")
+    return rng.choice(candidates)
+
+
+def choose_bridge_node(giver_id, receiver_id, candidates, excluded=()):
+    """Pick someone to move between ``giver_id`` and ``receiver_id`` when they can't be joined.
+
+    ``candidates`` are ``(before, node, after)`` runs from the current cycle.
+    Returns the first run where ``giver -> node -> receiver`` and
+    ``before -> after`` are all allowed.
+    """
+    forbidden = set(excluded)
+    for before, node, after in candidates:
+        if node in (giver_id, receiver_id) or before == after:
+            continue
+        if (
+            (giver_id, node) not in forbidden
+            and (node, receiver_id) not in forbidden
+            and (before, after) not in forbidden
+        ):
+            return before, node, after
+    raise MatchingError("No one can be moved to close the gap in the existing matches")
@@ -0,0 +1,239 @@
+"""Process-local metrics, shared between gunicorn workers through small files.
+
+Each process records counters and histograms in memory (one lock, a bisect
+per observation). A daemon thread writes the process's totals to
+``<METRICS_DIR>/<pid>-<start>.json`` about once a second, and the metrics
+endpoint sums every file in the directory, so the numbers cover all web
+workers and the email worker. Files are never rewritten by another process,
+so totals only go up; delete the directory to start from zero.
+"""
+
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.forksafe import PerProcess
+
+logger = logging.getLogger(__name__)
+
+# Seconds between writes of this process's metrics file
+FLUSH_INTERVAL = 1.0
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# name -> (type, help text, buckets)
+METRICS = {
+    "secretsanta_requests_total": ("counter", "HTTP requests handled.", None),
+    "secretsanta_request_duration_seconds": (
+        "histogram",
+        "Time to handle an HTTP request.",
+        LATENCY_BUCKETS,
+    ),
+    "secretsanta_request_sql_statements": (
+        "histogram",
+        "SQL statements run per HTTP request.",
+        COUNT_BUCKETS,
+    ),
+    "secretsanta_request_sql_seconds": (
+        "histogram",
+        "Time spent in SQL per HTTP request.",
+        LATENCY_BUCKETS,
+    ),
+    "secretsanta_sql_statement_duration_seconds": (
+        "histogram",
+        "Time to execute one SQL statement.",
+        LATENCY_BUCKETS,
+    ),
+    "secretsanta_smtp_duration_seconds": (
+        "histogram",
+        "Time per SMTP operation (connect, starttls, login, send).",
+        LATENCY_BUCKETS,
+    ),
+    "secretsanta_smtp_errors_total": ("counter", "Failed SMTP operations.", None),
+    "secretsanta_emails_total": ("counter", "Emails processed by the worker.", None),
+    "secretsanta_group_commit_size": (
+        "histogram",
+        "Registrations written per group-commit transaction.",
+        COUNT_BUCKETS,
+    ),
+    "secretsanta_email_render_seconds": (
+        "histogram",
+        "Time to render one batch of emails from their templates.",
+        LATENCY_BUCKETS,
+    ),
+    "secretsanta_log_records_dropped_total": (
+        "counter",
+        "Log records dropped because the log queue was full.",
+        None,
+    ),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _serialize_key(key):
+    name, labels = key
+    return json.dumps([name, labels])
+
+
+class Registry:
+    """Counters and histograms for one process."""
+
+    def __init__(self):
+        self.directory = None
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._dirty = False
+        self._path = None
+        self._flusher = PerProcess(self._start_flusher)
+
+    def configure(self, directory):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def inc(self, name, amount=1, **labels):
+        self._ensure_flusher()
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    def observe(self, name, value, **labels):
+        self._ensure_flusher()
+        buckets = METRICS[name][2]
+        key = _key(name, labels)
+        with self._lock:
+            # Per-bucket counts (last slot is +Inf), then sum
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-1] += value
+            self._dirty = True
+
+    @contextmanager
+    def timed(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": {_serialize_key(key): value for key, value in self._counters.items()},
+                "histograms": {
+                    _serialize_key(key): list(series) for key, series in self._histograms.items()
+                },
+            }
+
+    def _ensure_flusher(self):
+        if self.directory:
+            self._flusher.ensure()
+
+    def _start_flusher(self):
+        # A forked child drops what it inherited, which its parent's file already holds
+        with self._lock:
+            self._path = os.path.join(self.directory, f"{os.getpid()}-{int(time.time())}.json")
+            self._counters.clear()
+            self._histograms.clear()
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Write this process's totals to its file if anything changed."""
+        if not self._path or not self._dirty:
+            return
+        self._dirty = False
+        data = self.snapshot()
+        tmp = f"{self._path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning("Could not write metrics file %s: %s", self._path, e)
+
+    def collect(self):
+        """Sum the metrics of every process that wrote to the directory (or just this one)."""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key, value in data["counters"].items():
+                counters[key] = counters.get(key, 0) + value
+            for key, series in data["histograms"].items():
+                total = histograms.get(key)
+                if total is None or len(total) != len(series):
+                    histograms[key] = list(series)
+                else:
+                    histograms[key] = [a + b for a, b in zip(total, series, strict=True)]
+        return {"counters": counters, "histograms": histograms}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(data):
+    """Format collected metrics in the Prometheus text exposition format."""
+    series = {}
+    for kind in ("counters", "histograms"):
+        for key, value in data[kind].items():
+            name, labels = json.loads(key)
+            series.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if name not in series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series[name]):
+            if kind == "counter":
+                lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), value[:-1], strict=True):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels([*labels, ('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+timed = registry.timed
+
+atexit.register(registry.flush)
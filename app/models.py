@@ -22,17 +22,58 @@ class Participant(db.Model):
 
 class Match(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    giver_id = db.Column(db.Integer, db.ForeignKey("participant.id"), nullable=False)
-    receiver_id = db.Column(db.Integer, db.ForeignKey("participant.id"), nullable=False)
-    email_sent = db.Column(db.Boolean, default=False)
-    revealed = db.Column(db.Boolean, default=False)
+    giver_id = db.Column(db.Integer, db.ForeignKey("participant.id"), nullable=False, index=True)
+    receiver_id = db.Column(db.Integer, db.ForeignKey("participant.id"), nullable=False, index=True)
+    email_sent = db.Column(db.Boolean, default=False, index=True)
+    revealed = db.Column(db.Boolean, default=False, index=True)
     thank_you_email_sent = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @classmethod
+    def with_participants(cls):
+        """Query matches with giver and receiver loaded in the same SELECT (no N+1)."""
+        return cls.query.options(db.joinedload(cls.giver), db.joinedload(cls.receiver))
+
     def __repr__(self):
         return f"<Match: {self.giver_id} -> {self.receiver_id}>"
 
 
+class Exclusion(db.Model):
+    """A giver who must not be matched with a particular receiver (e.g. partners)."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    giver_id = db.Column(db.Integer, db.ForeignKey("participant.id"), nullable=False)
+    receiver_id = db.Column(db.Integer, db.ForeignKey("participant.id"), nullable=False, index=True)
+
+    giver = db.relationship("Participant", foreign_keys=[giver_id])
+    receiver = db.relationship("Participant", foreign_keys=[receiver_id])
+
+    __table_args__ = (db.UniqueConstraint("giver_id", "receiver_id"),)
+
+    def __repr__(self):
+        return f"<Exclusion: {self.giver_id} -/-> {self.receiver_id}>"
+
+
+class Outbox(db.Model):
+    """An email waiting to be delivered (or already delivered) by the background worker."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # "match" or "thank_you"
+    match_id = db.Column(db.Integer, db.ForeignKey("match.id"), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    # When a queued email that failed with a temporary error may be tried again
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+
+    match = db.relationship("Match")
+
+    def __repr__(self):
+        return f"<Outbox {self.kind} for match {self.match_id}: {self.status}>"
+
+
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
@@ -0,0 +1,143 @@
+"""Conditional GET and a rendered-fragment cache for pages that follow the event state.
+
+The home page, the registration form and the reveal table only change when the
+event does: a phase change, matches being created or spliced, a reveal. Each of
+those bumps the event generation (``app.phase``), which every process reads once
+per request anyway. Pages are cached against it:
+
+- ``@conditional`` gives a page an ETag and Last-Modified built from the
+  generation, and answers a matching request with 304 before doing any work.
+- ``fragment()`` keeps the rendered HTML of a template per process and reuses it
+  until the generation moves on.
+
+Changes that affect these pages without changing the phase call ``invalidate()``
+in their transaction. Pages showing flashed messages are never cached.
+
+CSRF tokens differ per session, so cached fragments are rendered with a
+placeholder that is swapped for the request's token on the way out.
+"""
+
+import hashlib
+import os
+import time
+from datetime import UTC, datetime
+from functools import wraps
+
+from flask import current_app, make_response, render_template, request, session
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from app.assets import load_manifest
+from app.phase import bump_generation, current_generation
+
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+# name -> (generation, html) for the fragments this process has rendered
+_fragments = {}
+
+
+def enabled():
+    # Templates reload on change in debug mode, which a cache would hide
+    return current_app.config["PAGE_CACHE"] and not current_app.debug
+
+
+def invalidate():
+    """Make every process re-render cached pages; the caller commits."""
+    return bump_generation()
+
+
+def fragment(name, template, load=dict):
+    """Render ``template`` with the context returned by ``load``, cached per generation.
+
+    ``load`` is only called when the fragment has to be rendered, so the queries
+    behind it are skipped on a cache hit.
+    """
+    if not enabled():
+        return Markup(render_template(template, **load()))
+
+    generation = current_generation()
+    cached = _fragments.get(name)
+    if cached is not None and cached[0] == generation:
+        html = cached[1]
+    else:
+        html = render_template(template, **load(), csrf_token=lambda: CSRF_PLACEHOLDER)
+        _fragments[name] = (generation, html)
+    if CSRF_PLACEHOLDER in html:
+        html = html.replace(CSRF_PLACEHOLDER, generate_csrf())
+    return Markup(html)
+
+
+def _release():
+    """Digest of the templates and built assets, so a deploy changes every ETag."""
+    release = current_app.extensions.get("page_release")
+    if release is None:
+        digest = hashlib.sha256()
+        templates = os.path.join(current_app.root_path, current_app.template_folder)
+        for root, dirs, files in os.walk(templates):
+            dirs.sort()
+            for name in sorted(files):
+                with open(os.path.join(root, name), "rb") as f:
+                    digest.update(f.read())
+        digest.update(repr(sorted(load_manifest(current_app.static_folder).items())).encode())
+        release = current_app.extensions["page_release"] = digest.hexdigest()
+    return release
+
+
+def _etag(generation):
+    """ETag for the current request's view of a page at ``generation``.
+
+    Besides the generation it covers whatever the base layout and forms show per
+    visitor: admin login, the session's CSRF secret, and a time bucket of half the
+    CSRF time limit, so a page revalidated from cache never carries a token that
+    expires before the form can be submitted.
+    """
+    time_limit = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    bucket = int(time.time() // (time_limit / 2)) if time_limit else 0
+    digest = hashlib.sha256(
+        repr(
+            (
+                _release(),
+                bool(session.get("admin_authenticated")),
+                session.get(current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token")),
+                bucket,
+            )
+        ).encode()
+    ).hexdigest()[:16]
+    return f"{generation}-{digest}"
+
+
+def conditional(view):
+    """Answer GET requests with 304 while the page is unchanged for this visitor."""
+
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        if request.method not in ("GET", "HEAD") or not enabled():
+            return view(*args, **kwargs)
+
+        if "_flashes" in session:
+            # The messages show once; a cached copy must not bring them back
+            response = make_response(view(*args, **kwargs))
+            response.cache_control.no_store = True
+            return response
+
+        generation = current_generation()
+        etag = _etag(generation)
+        last_modified = datetime.fromtimestamp(int(generation) / 1000, UTC)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            # Rendering a form may have started the session's CSRF secret
+            etag = _etag(generation)
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        # Browsers may keep the page but must check back every time; shared caches may not
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add("Cookie")
+        return response
+
+    return decorated_function
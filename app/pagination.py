@@ -0,0 +1,37 @@
+"""Keyset pagination for admin tables.
+
+Pages are addressed by the id of the row at their edge (``?after=<id>`` or
+``?before=<id>``) instead of an offset, so fetching page 500 costs the same
+index range scan as fetching page 1.
+"""
+
+from collections import namedtuple
+
+DEFAULT_PAGE_SIZE = 50
+
+Page = namedtuple("Page", ["items", "prev_cursor", "next_cursor"])
+
+
+def keyset_page(query, column, after=None, before=None, size=DEFAULT_PAGE_SIZE):
+    """Return one ``Page`` of ``query`` ordered by the unique ``column``.
+
+    One row past the page is fetched to tell whether a further page exists.
+    ``prev_cursor``/``next_cursor`` are the values to pass back as
+    ``before``/``after`` (``None`` when there is nothing in that direction).
+    """
+    key = column.key
+    if before is not None:
+        rows = query.filter(column < before).order_by(column.desc()).limit(size + 1).all()
+        has_prev = len(rows) > size
+        items = rows[:size][::-1]
+        prev_cursor = getattr(items[0], key) if has_prev else None
+        next_cursor = getattr(items[-1], key) if items else None
+        return Page(items, prev_cursor, next_cursor)
+
+    if after is not None:
+        query = query.filter(column > after)
+    rows = query.order_by(column).limit(size + 1).all()
+    items = rows[:size]
+    prev_cursor = getattr(items[0], key) if after is not None and items else None
+    next_cursor = getattr(items[-1], key) if len(rows) > size else None
+    return Page(items, prev_cursor, next_cursor)
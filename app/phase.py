@@ -0,0 +1,125 @@
+"""The event phase (registration -> matching -> locked), cached per process.
+
+The phase lives in the ``Settings`` table next to a generation counter that is
+bumped on every change. Each process caches the phase it last saw together with
+that generation, so a request only has to read the generation row to know its
+cache is current - a change made by one gunicorn worker is picked up by the
+others on their next request.
+
+The generation is also bumped by other changes that cached pages depend on (see
+``app.pagecache``). It holds the time of the last bump in milliseconds, so it
+doubles as the pages' Last-Modified time.
+"""
+
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import Integer, String, cast, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Match, Outbox, Settings
+
+REGISTRATION = "registration"
+MATCHING = "matching"
+LOCKED = "locked"
+
+PHASE_KEY = "event_phase"
+GENERATION_KEY = "event_generation"
+PHASE_KEYS = (PHASE_KEY, GENERATION_KEY)
+
+# (generation, phase) last seen by this process
+_cache = {"generation": None, "phase": None}
+
+
+def _read_setting(key):
+    return db.session.execute(select(Settings.value).where(Settings.key == key)).scalar()
+
+
+def _derive_phase():
+    """Work the phase out from matches and emails (databases from before phases existed)."""
+    if (
+        Match.query.filter_by(email_sent=True).first()
+        or Outbox.query.filter_by(kind="match").first()
+    ):
+        return LOCKED
+    if Match.query.first():
+        return MATCHING
+    return REGISTRATION
+
+
+def _initialize():
+    phase = _derive_phase()
+    db.session.add(Settings(key=PHASE_KEY, value=phase))
+    # Start from a timestamp so a re-created row never repeats a generation
+    # that another process still has cached
+    db.session.add(Settings(key=GENERATION_KEY, value=str(int(time.time() * 1000))))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker initialised it first; use theirs
+        db.session.rollback()
+    return _read_setting(GENERATION_KEY)
+
+
+def current_generation():
+    """The phase generation, read at most once per request."""
+    if has_request_context() and "event_generation" in g:
+        return g.event_generation
+
+    generation = _read_setting(GENERATION_KEY)
+    if generation is None:
+        generation = _initialize()
+
+    if has_request_context():
+        g.event_generation = generation
+    return generation
+
+
+def current_phase():
+    """Return the event phase, hitting the database only for the generation row."""
+    generation = current_generation()
+    if _cache["generation"] != generation:
+        _cache["phase"] = _read_setting(PHASE_KEY)
+        _cache["generation"] = generation
+    return _cache["phase"]
+
+
+def stored_phase():
+    """Read the phase from the database, bypassing the per-process cache.
+
+    Call it after the transaction has written a row: SQLite then holds the write
+    lock, so the phase read here can't change before the commit.
+    """
+    return _read_setting(PHASE_KEY)
+
+
+def bump_generation():
+    """Start a new generation in the current transaction; the caller commits.
+
+    The increment happens in SQL, so bumps from two processes at once never
+    end up on the same number.
+    """
+    previous = current_generation()
+    now = int(time.time() * 1000)
+    generation = db.session.execute(
+        update(Settings)
+        .where(Settings.key == GENERATION_KEY)
+        .values(value=cast(func.max(cast(Settings.value, Integer) + 1, now), String))
+        .returning(Settings.value),
+        execution_options={"synchronize_session": False},
+    ).scalar()
+
+    if has_request_context():
+        g.event_generation = generation
+    # The phase didn't change, so a cached phase carries over
+    if _cache["generation"] == previous:
+        _cache["generation"] = generation
+    return generation
+
+
+def set_phase(phase):
+    """Record a phase change in the current transaction; the caller commits."""
+    Settings.query.filter_by(key=PHASE_KEY).update({"value": phase})
+    _cache["generation"] = bump_generation()
+    _cache["phase"] = phase
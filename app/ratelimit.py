@@ -0,0 +1,124 @@
+"""Rate-limit counters shared by all gunicorn workers, stored in a SQLite file.
+
+``memory://`` keeps separate counters in every worker (so the effective limit
+is multiplied by the worker count) and forgets them on restart. This storage
+keeps fixed-window counters in a small SQLite database next to the app's
+database instead, so every worker sees the same counts without running Redis
+or memcached.
+
+Importing this module registers the ``sqlite://`` scheme with ``limits``, so
+it can be used as ``RATELIMIT_STORAGE_URI = "sqlite:////app/data/ratelimits.db"``.
+Each hit is a single UPSERT ... RETURNING statement on a per-thread connection.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+from sqlalchemy.engine import make_url
+
+from app.database import data_directory
+
+# Expired windows are swept after this many increments
+PURGE_INTERVAL = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expiry REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# Start a new window if the stored one has expired, otherwise add to it
+INCR = """
+INSERT INTO rate_limit (key, count, expiry) VALUES (:key, :amount, :expiry)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN expiry <= :now THEN excluded.count ELSE count + excluded.count END,
+    expiry = CASE WHEN expiry <= :now THEN excluded.expiry ELSE expiry END
+RETURNING count
+"""
+
+
+def default_storage_uri(database_uri):
+    """Put the counters next to a SQLite database file; fall back to memory otherwise."""
+    directory = data_directory(database_uri)
+    if directory is None:
+        return "memory://"
+    return f"sqlite:///{os.path.join(directory, 'ratelimits.db')}"
+
+
+class SQLiteStorage(Storage):
+    """Fixed-window rate-limit storage in a SQLite file shared between processes."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri, wrap_exceptions=False, busy_timeout_ms=5000, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = make_url(uri).database
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self._local = threading.local()
+        self._increments = 0
+        self._connection().execute(SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork (gunicorn workers)
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Counters don't need to survive a power loss, only a crashed worker
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        connection = self._connection()
+        (count,) = connection.execute(
+            INCR, {"key": key, "amount": amount, "expiry": now + expiry, "now": now}
+        ).fetchone()
+
+        self._increments += 1
+        if self._increments % PURGE_INTERVAL == 0:
+            connection.execute("DELETE FROM rate_limit WHERE expiry <= ?", (now,))
+        return count
+
+    def get(self, key):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT count FROM rate_limit WHERE key = ? AND expiry > ?", (key, time.time())
+            )
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = (
+            self._connection()
+            .execute("SELECT expiry FROM rate_limit WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1")
+        except sqlite3.Error:
+            return False
+        return True
+
+    def reset(self):
+        return self._connection().execute("DELETE FROM rate_limit").rowcount
+
+    def clear(self, key):
+        self._connection().execute("DELETE FROM rate_limit WHERE key = ?", (key,))
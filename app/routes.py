@@ -1,30 +1,68 @@
+import hmac
+import itertools
 import logging
 import random
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from functools import wraps
 
-from email_validator import EmailNotValidError, validate_email
 from flask import (
     Blueprint,
+    Response,
+    abort,
     current_app,
     flash,
     redirect,
     render_template,
     request,
     session,
+    stream_with_context,
     url_for,
 )
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import check_password_hash
 
-from app import db, limiter
-from app.models import Match, Participant, Settings
+from app import db, groupcommit, limiter, metrics, pagecache
+from app.exporter import FORMATS as EXPORT_FORMATS
+from app.exporter import export_matches, export_participants
+from app.importer import FORMATS as IMPORT_FORMATS
+from app.importer import detect_format, import_participants, open_text
+from app.matching import (
+    MatchingError,
+    choose_bridge_node,
+    choose_splice_edge,
+    cycle_pairs,
+    find_cycle,
+)
+from app.models import Exclusion, Match, Outbox, Participant, Settings
+from app.pagination import keyset_page
+from app.phase import (
+    LOCKED,
+    MATCHING,
+    PHASE_KEYS,
+    REGISTRATION,
+    current_phase,
+    set_phase,
+    stored_phase,
+)
+from app.validation import InvalidRegistration, validate_registration
 
 logger = logging.getLogger(__name__)
 
 main = Blueprint("main", __name__)
 
+# Random existing matches considered when splicing someone into or out of the cycle
+SPLICE_CANDIDATES = 32
+# Match rows written per executemany call when creating matches
+MATCH_INSERT_CHUNK = 5000
+# Failed emails listed on the dashboard
+DEAD_LETTERS_SHOWN = 50
+
+REGISTRATION_CLOSED = "Registration is closed - emails have already been sent!"
+
+
+class RegistrationClosed(Exception):
+    """Emails were sent while a registration was being written."""
+
 
 def admin_required(f):
     @wraps(f)
@@ -36,74 +74,224 @@ def admin_required(f):
     return decorated_function
 
 
+def _excluded_pairs(*participant_ids):
+    """Exclusions with any of ``participant_ids`` as giver or receiver (both are indexed)."""
+    return set(
+        db.session.query(Exclusion.giver_id, Exclusion.receiver_id).filter(
+            Exclusion.giver_id.in_(participant_ids) | Exclusion.receiver_id.in_(participant_ids)
+        )
+    )
+
+
+def _random_matches(statement, match_id, limit=SPLICE_CANDIDATES):
+    """Up to ``limit`` rows of ``statement`` from a random point in match-id order.
+
+    Walks the primary key from a random id (wrapping round to the start)
+    instead of sorting the whole table with ORDER BY random().
+    """
+    low, high = db.session.execute(select(func.min(Match.id), func.max(Match.id))).one()
+    if low is None:
+        return []
+    start = random.randint(low, high)
+    rows = db.session.execute(
+        statement.where(match_id >= start).order_by(match_id).limit(limit)
+    ).all()
+    if len(rows) < limit:
+        rows += db.session.execute(
+            statement.where(match_id < start).order_by(match_id).limit(limit - len(rows))
+        ).all()
+    return rows
+
+
+def _insert_matches(pairs):
+    """Write ``(giver_id, receiver_id)`` tuples with chunked driver-level executemany calls.
+
+    The INSERT is compiled once from the table for the connection's dialect, and the
+    model's column defaults are evaluated and bound once for the whole batch. Rows
+    then go straight to the DB-API cursor, skipping per-row ORM objects and
+    SQLAlchemy parameter processing.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect
+    table = Match.__table__
+
+    defaults = {}
+    for column in table.columns:
+        if column.default is None or column.key in ("giver_id", "receiver_id"):
+            continue
+        value = column.default.arg(None) if column.default.is_callable else column.default.arg
+        process = column.type.bind_processor(dialect)
+        defaults[column.key] = process(value) if process else value
+
+    compiled = (
+        insert(table)
+        .inline()
+        .compile(dialect=dialect, column_keys=["giver_id", "receiver_id", *defaults])
+    )
+    sql = str(compiled)
+    if compiled.positional:
+        # Columns follow the table, where giver_id and receiver_id come first
+        rest = tuple(defaults[key] for key in compiled.positiontup[2:])
+    pairs = iter(pairs)
+    while chunk := list(itertools.islice(pairs, MATCH_INSERT_CHUNK)):
+        if compiled.positional:
+            rows = [(giver, receiver, *rest) for giver, receiver in chunk]
+        else:
+            rows = [{**defaults, "giver_id": g, "receiver_id": r} for g, r in chunk]
+        connection.exec_driver_sql(sql, rows)
+
+
+def _splice_in(participant):
+    """Add a late registration to the existing match cycle (one update, one insert)."""
+    candidates = _random_matches(select(Match), Match.id)
+    edges = {(m.giver_id, m.receiver_id): m for (m,) in candidates}
+    # Only exclusions naming the newcomer matter, and a brand-new participant rarely has any
+    giver_id, receiver_id = choose_splice_edge(
+        edges, participant.id, _excluded_pairs(participant.id)
+    )
+
+    edges[(giver_id, receiver_id)].receiver_id = participant.id
+    db.session.add(Match(giver_id=participant.id, receiver_id=receiver_id))
+
+
+def _splice_out(participant_id):
+    """Remove a participant from the match cycle by joining their giver to their receiver.
+
+    Returns None if the participant wasn't matched, True if the cycle was
+    repaired and False if the remaining matches had to be cleared instead.
+    """
+    incoming = Match.query.filter_by(receiver_id=participant_id).first()
+    outgoing = Match.query.filter_by(giver_id=participant_id).first()
+    if not incoming and not outgoing:
+        return None
+    if not incoming or not outgoing:
+        # Not part of a complete cycle; just drop what's there
+        Match.query.filter(
+            (Match.giver_id == participant_id) | (Match.receiver_id == participant_id)
+        ).delete()
+        return True
+
+    db.session.delete(outgoing)
+
+    giver_id, receiver_id = incoming.giver_id, outgoing.receiver_id
+    if giver_id == receiver_id:
+        # Only one person would be left in the cycle
+        db.session.delete(incoming)
+        return False
+
+    if (giver_id, receiver_id) not in _excluded_pairs(giver_id):
+        incoming.receiver_id = receiver_id
+        return True
+
+    # The direct join is excluded, so move someone else into the gap:
+    # before -> node -> after becomes before -> after, giver -> node -> receiver
+    first, second = db.aliased(Match), db.aliased(Match)
+    runs = _random_matches(
+        select(first.giver_id, first.receiver_id, second.receiver_id)
+        .join(second, second.giver_id == first.receiver_id)
+        .where(
+            first.giver_id.not_in([participant_id, giver_id]),
+            first.receiver_id.not_in([participant_id, giver_id, receiver_id]),
+        ),
+        first.id,
+    )
+    # Every pair choose_bridge_node checks has a giver among these
+    excluded = _excluded_pairs(
+        giver_id, *{before for before, _, _ in runs}, *{n for _, n, _ in runs}
+    )
+    try:
+        before, node, after = choose_bridge_node(giver_id, receiver_id, runs, excluded)
+    except MatchingError:
+        Outbox.query.delete()
+        Match.query.delete()
+        return False
+
+    incoming.receiver_id = node
+    Match.query.filter_by(giver_id=node).update({"receiver_id": receiver_id})
+    Match.query.filter_by(giver_id=before).update({"receiver_id": after})
+    return True
+
+
+def _add_participant(name, email, gift_preference):
+    """Insert a participant in one round trip; False if the email is already registered.
+
+    Raises ``RegistrationClosed`` if emails went out after the request checked the phase.
+    """
+    participant = Participant(name=name, email=email, gift_preference=gift_preference)
+    db.session.add(participant)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+    # The cached phase may be stale by now; this read holds until the commit
+    phase = stored_phase()
+    if phase == LOCKED:
+        db.session.rollback()
+        raise RegistrationClosed
+
+    # If matches already exist, fit the newcomer into the cycle instead of re-matching
+    if phase == MATCHING:
+        try:
+            _splice_in(participant)
+            pagecache.invalidate()
+        except MatchingError as e:
+            logger.warning("Could not add %s to existing matches: %s", email, e)
+    db.session.commit()
+    return True
+
+
 @main.route("/")
+@pagecache.conditional
 def index():
-    return render_template("index.html")
+    return render_template(
+        "index.html", fragment=pagecache.fragment("index", "fragments/index.html")
+    )
 
 
 @main.route("/register", methods=["GET", "POST"])
+# On top of the default limits (50 per hour, 200 per day), not instead of them
+@limiter.limit(
+    lambda: current_app.config["REGISTER_RATE_LIMIT"], methods=["POST"], override_defaults=False
+)
+@pagecache.conditional
 def register():
     if request.method == "POST":
         # Check if registration is locked (emails have been sent)
-        any_emails_sent = Match.query.filter_by(email_sent=True).first()
-        if any_emails_sent:
-            flash("Registration is closed - emails have already been sent!", "error")
+        phase = current_phase()
+        if phase == LOCKED:
+            flash(REGISTRATION_CLOSED, "error")
             return redirect(url_for("main.index"))
 
         name = request.form.get("name", "").strip()
         email = request.form.get("email", "").strip()
         gift_preference = request.form.get("gift_preference", "").strip()
 
-        # Validate name
-        if not name:
-            flash("Name is required!", "error")
-            return render_template(
-                "register.html", name=name, email=email, gift_preference=gift_preference
-            )
-
-        if len(name) > 100:
-            flash("Name is too long (maximum 100 characters)!", "error")
-            return render_template(
-                "register.html", name=name, email=email, gift_preference=gift_preference
-            )
-
-        # Validate email
-        if not email:
-            flash("Email is required!", "error")
-            return render_template(
-                "register.html", name=name, email=email, gift_preference=gift_preference
-            )
-
         try:
-            valid_email = validate_email(email, check_deliverability=False)
-            email = valid_email.normalized
-        except EmailNotValidError as e:
-            flash(f"Invalid email address: {str(e)}", "error")
+            name, email, gift_preference = validate_registration(name, email, gift_preference)
+        except InvalidRegistration as e:
+            flash(str(e), "error")
             return render_template(
                 "register.html", name=name, email=email, gift_preference=gift_preference
             )
 
-        # Validate gift preference length
-        if len(gift_preference) > 500:
-            flash("Gift preferences are too long (maximum 500 characters)!", "error")
-            return render_template(
-                "register.html", name=name, email=email, gift_preference=gift_preference
-            )
-
-        # Check if email already exists
-        existing = Participant.query.filter_by(email=email).first()
-        if existing:
+        # Insert straight away and let the unique email constraint catch duplicates
+        if phase == REGISTRATION and current_app.config["REGISTER_GROUP_COMMIT_MS"]:
+            registered = groupcommit.register(current_app, name, email, gift_preference)
+        else:
+            try:
+                registered = _add_participant(name, email, gift_preference)
+            except RegistrationClosed:
+                flash(REGISTRATION_CLOSED, "error")
+                return redirect(url_for("main.index"))
+        if not registered:
             flash("This email is already registered!", "error")
             return render_template(
                 "register.html", name=name, email=email, gift_preference=gift_preference
             )
 
-        # Create new participant
-        participant = Participant(name=name, email=email, gift_preference=gift_preference)
-        db.session.add(participant)
-        db.session.commit()
-
-        logger.info(f"New participant registered: {email}")
+        logger.info("New participant registered: %s", email)
         flash(
             "Registration successful! You will receive an email with your Secret Santa match.",
             "success",
@@ -111,10 +299,12 @@ def register():
         return redirect(url_for("main.index"))
 
     # Check if registration is locked for GET requests too
-    any_emails_sent = Match.query.filter_by(email_sent=True).first()
-    registration_locked = any_emails_sent is not None
-
-    return render_template("register.html", registration_locked=registration_locked)
+    form = pagecache.fragment(
+        "register",
+        "fragments/register_form.html",
+        lambda: {"registration_locked": current_phase() == LOCKED},
+    )
+    return render_template("register.html", fragment=form)
 
 
 @main.route("/admin/login", methods=["GET", "POST"])
@@ -138,7 +328,7 @@ def admin_login():
             logger.info("Admin login successful")
             return redirect(url_for("main.admin_dashboard"))
         else:
-            logger.warning(f"Failed admin login attempt from {request.remote_addr}")
+            logger.warning("Failed admin login attempt from %s", request.remote_addr)
             flash("Invalid password", "error")
 
     return render_template("admin_login.html")
@@ -153,34 +343,97 @@ def admin_logout():
 @main.route("/admin/dashboard")
 @admin_required
 def admin_dashboard():
-    participants = Participant.query.all()
-    matches = Match.query.all()
-    matches_created = len(matches) > 0
-    any_emails_sent = Match.query.filter_by(email_sent=True).first() is not None
-
-    # Determine current phase
-    if any_emails_sent:
-        phase = "locked"
+    search = request.args.get("q", "").strip()
+    participant_count = db.session.scalar(select(func.count(Participant.id)))
+    match_count = db.session.scalar(select(func.count(Match.id)))
+    exclusion_count = db.session.scalar(select(func.count(Exclusion.id)))
+    matches_created = match_count > 0
+    phase = current_phase()
+    any_emails_sent = phase == LOCKED
+
+    # Only one page of each table is loaded; the search applies to names and emails
+    participant_query = Participant.query
+    match_query = Match.with_participants()
+    if search:
+        found = select(Participant.id).where(
+            Participant.name.contains(search, autoescape=True)
+            | Participant.email.contains(search, autoescape=True)
+        )
+        participant_query = participant_query.filter(Participant.id.in_(found))
+        match_query = match_query.filter(Match.giver_id.in_(found) | Match.receiver_id.in_(found))
+    participants = keyset_page(
+        participant_query,
+        Participant.id,
+        after=request.args.get("p_after", type=int),
+        before=request.args.get("p_before", type=int),
+    )
+    matches = keyset_page(
+        match_query,
+        Match.id,
+        after=request.args.get("m_after", type=int),
+        before=request.args.get("m_before", type=int),
+    )
+    exclusions = keyset_page(
+        Exclusion.query.options(db.joinedload(Exclusion.giver), db.joinedload(Exclusion.receiver)),
+        Exclusion.id,
+        after=request.args.get("x_after", type=int),
+        before=request.args.get("x_before", type=int),
+    )
+
+    # Describe current phase
+    if phase == LOCKED:
         phase_message = "Locked - Emails have been sent"
         phase_color = "red"
-    elif matches_created:
-        phase = "matching"
+    elif phase == MATCHING:
         phase_message = "Matching Phase - You can add participants and re-match"
         phase_color = "orange"
     else:
-        phase = "registration"
         phase_message = "Registration Open"
         phase_color = "green"
 
+    # Delivery progress of the background email worker
+    status_counts = dict(
+        db.session.query(Outbox.status, func.count(Outbox.id)).group_by(Outbox.status).all()
+    )
+    retrying, next_retry = (
+        db.session.query(func.count(Outbox.id), func.min(Outbox.next_attempt_at))
+        .filter(Outbox.status == "queued", Outbox.next_attempt_at.is_not(None))
+        .one()
+    )
+    dead_letters = (
+        Outbox.query.options(
+            db.joinedload(Outbox.match).joinedload(Match.giver),
+            db.joinedload(Outbox.match).joinedload(Match.receiver),
+        )
+        .filter_by(status="failed")
+        .order_by(Outbox.id)
+        .limit(DEAD_LETTERS_SHOWN)
+        .all()
+    )
+    delivery = {
+        "queued": status_counts.get("queued", 0) + status_counts.get("sending", 0) - retrying,
+        "retrying": retrying,
+        "next_retry": next_retry,
+        "sent": status_counts.get("sent", 0),
+        "failed": status_counts.get("failed", 0),
+        "dead_letters": dead_letters,
+    }
+
     return render_template(
         "admin_dashboard.html",
+        search=search,
         participants=participants,
+        participant_count=participant_count,
+        exclusions=exclusions,
+        exclusion_count=exclusion_count,
         matches=matches,
+        match_count=match_count,
         matches_created=matches_created,
         any_emails_sent=any_emails_sent,
         phase=phase,
         phase_message=phase_message,
         phase_color=phase_color,
+        delivery=delivery,
     )
 
 
@@ -188,59 +441,41 @@ def admin_dashboard():
 @admin_required
 def create_matches():
     # Check if emails have been sent (prevents re-matching after emails sent)
-    any_emails_sent = Match.query.filter_by(email_sent=True).first()
-    if any_emails_sent:
+    if current_phase() == LOCKED:
         flash("Cannot recreate matches - emails have already been sent!", "error")
         return redirect(url_for("main.admin_dashboard"))
 
-    # Clear existing matches if any exist (allow re-matching before emails sent)
-    existing_matches = Match.query.first()
-    if existing_matches:
-        Match.query.delete()
-        db.session.commit()
-        logger.info("Admin cleared previous matches to create new ones")
-        flash("Previous matches cleared. Creating new matches...", "info")
-
-    participants = Participant.query.all()
+    # Only ids are needed; skip building an ORM object per participant
+    participant_ids = db.session.scalars(select(Participant.id)).all()
 
-    if len(participants) < 2:
+    if len(participant_ids) < 2:
         flash("Need at least 2 participants to create matches!", "error")
         return redirect(url_for("main.admin_dashboard"))
 
-    # Create Secret Santa matches using a single-cycle algorithm
+    # Create Secret Santa matches as a single cycle that respects every exclusion
     # This ensures everyone is in one connected chain, preventing small loops
     # (e.g., prevents A->B, B->A, C->D, D->C pattern)
-
-    max_attempts = 100
-    for _attempt in range(max_attempts):
-        # Shuffle participants to get random order
-        shuffled = participants.copy()
-        random.shuffle(shuffled)
-
-        # Create a single cycle: each person gives to the next, last gives to first
-        # This guarantees one complete loop through all participants
-        matches_list = []
-        for i in range(len(shuffled)):
-            giver = shuffled[i]
-            receiver = shuffled[(i + 1) % len(shuffled)]  # Next person, wrapping around
-            matches_list.append((giver.id, receiver.id))
-
-        # Verify no one gives to themselves (should be impossible with 2+ people, but double-check)
-        valid = all(giver_id != receiver_id for giver_id, receiver_id in matches_list)
-
-        if valid:
-            # Create match records
-            for giver_id, receiver_id in matches_list:
-                match = Match(giver_id=giver_id, receiver_id=receiver_id)
-                db.session.add(match)
-            break
-    else:
-        flash("Could not create valid matches. Try again!", "error")
+    excluded = db.session.query(Exclusion.giver_id, Exclusion.receiver_id).all()
+    try:
+        order = find_cycle(participant_ids, excluded)
+    except MatchingError as e:
+        flash(f"Could not create valid matches: {e}", "error")
         return redirect(url_for("main.admin_dashboard"))
 
+    # Replace any existing matches (allowed before emails are sent) in one transaction
+    existing_matches = Match.query.first()
+    if existing_matches:
+        Outbox.query.delete()
+        Match.query.delete()
+        logger.info("Admin cleared previous matches to create new ones")
+        flash("Previous matches cleared. Creating new matches...", "info")
+
+    _insert_matches(cycle_pairs(order))
+    set_phase(MATCHING)
     db.session.commit()
+
     flash(
-        f"Successfully created {len(participants)} Secret Santa matches in one connected chain!",
+        f"Successfully created {len(order)} Secret Santa matches in one connected chain!",
         "success",
     )
     return redirect(url_for("main.admin_dashboard"))
@@ -250,14 +485,15 @@ def create_matches():
 @admin_required
 def clear_matches():
     # Check if any emails have been sent
-    any_emails_sent = Match.query.filter_by(email_sent=True).first()
-    if any_emails_sent:
+    if current_phase() == LOCKED:
         flash("Cannot clear matches - emails have already been sent!", "error")
         return redirect(url_for("main.admin_dashboard"))
 
     # Delete all matches
     match_count = Match.query.count()
+    Outbox.query.delete()
     Match.query.delete()
+    set_phase(REGISTRATION)
     db.session.commit()
 
     logger.info("Admin cleared all matches")
@@ -268,103 +504,74 @@ def clear_matches():
 @main.route("/admin/send-emails", methods=["POST"])
 @admin_required
 def send_emails():
-    matches = Match.query.filter_by(email_sent=False).all()
+    # Queue every unsent match that isn't in the outbox yet (failed ones are
+    # requeued with "Retry Failed Emails")
+    already_queued = select(Outbox.match_id).where(Outbox.kind == "match")
+    unqueued = select(literal("match"), Match.id, literal("queued"), literal(0)).where(
+        Match.email_sent.is_(False), Match.id.not_in(already_queued)
+    )
+    result = db.session.execute(
+        insert(Outbox).from_select(["kind", "match_id", "status", "attempts"], unqueued)
+    )
 
-    if not matches:
-        flash("All emails have already been sent!", "info")
+    # Queued emails lock registration: participants and matches can't change any more
+    queued_count = result.rowcount
+    if queued_count:
+        set_phase(LOCKED)
+    db.session.commit()
+
+    if queued_count == 0:
+        if Outbox.query.filter(Outbox.status.in_(["queued", "sending"])).first():
+            flash("Emails are already queued and being delivered.", "info")
+        else:
+            flash("All emails have already been sent!", "info")
         return redirect(url_for("main.admin_dashboard"))
 
-    sent_count = 0
-    error_count = 0
-    first_error = None
+    logger.info("Admin queued %d match emails", queued_count)
+    flash(
+        f"Queued {queued_count} emails for delivery. Progress is shown on the dashboard.",
+        "success",
+    )
+    return redirect(url_for("main.admin_dashboard"))
 
-    for match in matches:
-        try:
-            giver = match.giver
-            receiver = match.receiver
-
-            # Sanitize names and preferences to prevent header injection
-            # Remove newlines and other control characters
-            giver_name = " ".join(giver.name.split())
-            receiver_name = " ".join(receiver.name.split())
-            gift_pref = " ".join((receiver.gift_preference or "No preference specified").split())
-
-            # Create email
-            msg = MIMEMultipart()
-            msg["From"] = current_app.config["SMTP_USERNAME"]
-            msg["To"] = giver.email
-            msg["Subject"] = "Your Secret Santa Match!"
-
-            body = f"""Hello {giver_name}!
-
-You are the Secret Santa for: {receiver_name}
-
-Their gift preference/suggestion: {gift_pref}
-
-Happy gifting!
-
-Best regards,
-Secret Santa Bot
-"""
-
-            msg.attach(MIMEText(body, "plain"))
-
-            # Send email
-            with smtplib.SMTP(
-                current_app.config["SMTP_SERVER"], current_app.config["SMTP_PORT"]
-            ) as server:
-                server.starttls()
-                server.login(
-                    current_app.config["SMTP_USERNAME"],
-                    current_app.config["SMTP_PASSWORD"],
-                )
-                server.send_message(msg)
-
-            # Mark as sent
-            match.email_sent = True
-            db.session.commit()
-            sent_count += 1
-
-        except smtplib.SMTPAuthenticationError as e:
-            error_count += 1
-            logger.error(f"SMTP authentication failed when sending to {giver.email}: {e}")
-            if not first_error:
-                first_error = (
-                    "SMTP authentication failed. Check SMTP_USERNAME and SMTP_PASSWORD in .env"
-                )
-        except smtplib.SMTPException as e:
-            error_count += 1
-            error_msg = str(e)
-            logger.error(f"SMTP error sending email to {giver.email}: {error_msg}")
-            if not first_error:
-                if "Connection refused" in error_msg:
-                    first_error = "Connection refused. Check SMTP_SERVER and SMTP_PORT in .env"
-                elif "timed out" in error_msg:
-                    first_error = "Connection timeout. Check network/firewall settings"
-                else:
-                    first_error = f"SMTP error: {error_msg}"
-        except Exception as e:
-            error_count += 1
-            error_msg = str(e)
-            logger.error(f"Unexpected error sending email to {giver.email}: {error_msg}")
-            if not first_error:
-                if "Name or service not known" in error_msg:
-                    first_error = "Cannot resolve SMTP server hostname. Check SMTP_SERVER in .env"
-                else:
-                    first_error = f"Error: {error_msg}"
-
-    if sent_count > 0:
-        flash(f"Successfully sent {sent_count} emails!", "success")
-    if error_count > 0:
-        flash(f"Failed to send {error_count} emails. {first_error}", "error")
 
+@main.route("/admin/retry-emails", methods=["POST"])
+@admin_required
+def retry_emails():
+    """Requeue every failed email (match and thank-you) with a fresh set of attempts."""
+    requeued = Outbox.query.filter_by(status="failed").update(
+        {"status": "queued", "attempts": 0, "next_attempt_at": None}
+    )
+    db.session.commit()
+
+    if requeued:
+        logger.info("Admin requeued %d failed emails", requeued)
+        flash(f"Queued {requeued} failed emails for another try.", "success")
+    else:
+        flash("There are no failed emails to retry.", "info")
     return redirect(url_for("main.admin_dashboard"))
 
 
-@main.route("/reveal")
+@main.route("/admin/email-preview/<int:match_id>")
 @admin_required
-def reveal():
-    matches = Match.query.all()
+def email_preview(match_id):
+    """Show the exact message (headers and body) the worker would send for a match."""
+    from app.mailer import EMAILS, render_messages
+
+    kind = request.args.get("kind", "match")
+    if kind not in EMAILS:
+        abort(404)
+    match = Match.with_participants().filter(Match.id == match_id).first_or_404()
+    [(_, msg)] = render_messages(
+        [(match.id, kind, match)],
+        current_app.config["SMTP_USERNAME"],
+        html=current_app.config["EMAIL_HTML"],
+    )
+    return Response(msg.as_string(), mimetype="text/plain")
+
+
+def _reveal_rows():
+    matches = Match.with_participants().all()
     match_list = []
 
     for match in matches:
@@ -377,7 +584,15 @@ def reveal():
             }
         )
 
-    return render_template("reveal.html", matches=match_list)
+    return {"matches": match_list}
+
+
+@main.route("/reveal")
+@admin_required
+@pagecache.conditional
+def reveal():
+    table = pagecache.fragment("reveal_table", "fragments/reveal_table.html", _reveal_rows)
+    return render_template("reveal.html", fragment=table)
 
 
 @main.route("/reveal/toggle/<int:match_id>", methods=["POST"])
@@ -387,70 +602,165 @@ def toggle_reveal(match_id):
     was_revealed = match.revealed
     match.revealed = not match.revealed
 
-    # If marking as revealed (and not already sent thank you email), send email to receiver
+    # If marking as revealed (and not already sent thank you email), queue email to receiver
     if match.revealed and not was_revealed and not match.thank_you_email_sent:
-        try:
-            receiver = match.receiver
-            giver = match.giver
+        already_queued = (
+            Outbox.query.filter_by(kind="thank_you", match_id=match.id)
+            .filter(Outbox.status.in_(["queued", "sending"]))
+            .first()
+        )
+        if not already_queued:
+            db.session.add(Outbox(kind="thank_you", match_id=match.id))
+        logger.info("Queued thank you reminder for match %s", match.id)
+        flash(
+            f"Marked as revealed and queued a thank you reminder to {match.receiver.name}!",
+            "success",
+        )
 
-            # Sanitize names to prevent header injection
-            receiver_name = " ".join(receiver.name.split())
-            giver_name = " ".join(giver.name.split())
+    pagecache.invalidate()
+    db.session.commit()
+    return redirect(url_for("main.reveal"))
 
-            # Create thank you reminder email
-            msg = MIMEMultipart()
-            msg["From"] = current_app.config["SMTP_USERNAME"]
-            msg["To"] = receiver.email
-            msg["Subject"] = "Your Secret Santa is Revealed!"
 
-            body = f"""Hello {receiver_name}!
+@main.route("/reveal/bulk", methods=["POST"])
+@admin_required
+def bulk_reveal():
+    """Mark every (or every selected) unrevealed match as revealed and queue thank-you emails."""
+    pending = Match.revealed.is_(False)
+    if request.form.get("scope") != "all":
+        match_ids = request.form.getlist("match_ids", type=int)
+        if not match_ids:
+            flash("Select the matches to reveal first.", "info")
+            return redirect(url_for("main.reveal"))
+        pending = pending & Match.id.in_(match_ids)
+
+    # Queue the thank-you emails before flipping the flags, skipping any already queued
+    already_queued = select(Outbox.match_id).where(
+        Outbox.kind == "thank_you", Outbox.status.in_(["queued", "sending"])
+    )
+    unqueued = select(literal("thank_you"), Match.id, literal("queued"), literal(0)).where(
+        pending, Match.thank_you_email_sent.is_(False), Match.id.not_in(already_queued)
+    )
+    queued = db.session.execute(
+        insert(Outbox).from_select(["kind", "match_id", "status", "attempts"], unqueued)
+    ).rowcount
+    revealed = Match.query.filter(pending).update({"revealed": True}, synchronize_session=False)
+    if revealed:
+        pagecache.invalidate()
+    db.session.commit()
 
-The Secret Santa reveal has happened! Your Secret Santa was: {giver_name}
+    logger.info("Admin revealed %d matches and queued %d thank you reminders", revealed, queued)
+    if revealed:
+        flash(
+            f"Marked {revealed} matches as revealed and queued {queued} thank you reminders!",
+            "success",
+        )
+    else:
+        flash("Those matches were already revealed.", "info")
+    return redirect(url_for("main.reveal"))
 
-We hope you enjoyed your gift! Please take a moment to send a thank you message to {giver_name} at {giver.email}.
 
-Happy Holidays!
+@main.route("/admin/exclusions", methods=["POST"])
+@admin_required
+def add_exclusion():
+    giver_email = request.form.get("giver_email", "").strip()
+    receiver_email = request.form.get("receiver_email", "").strip()
+    both_ways = request.form.get("both_ways") == "on"
+
+    giver = Participant.query.filter_by(email=giver_email).first()
+    receiver = Participant.query.filter_by(email=receiver_email).first()
+    if not giver or not receiver:
+        flash("Both emails must belong to registered participants!", "error")
+        return redirect(url_for("main.admin_dashboard"))
+    if giver.id == receiver.id:
+        flash("A participant never draws themselves - pick two different people!", "error")
+        return redirect(url_for("main.admin_dashboard"))
 
-Best regards,
-Secret Santa Bot
-"""
+    pairs = [(giver.id, receiver.id)]
+    if both_ways:
+        pairs.append((receiver.id, giver.id))
+    for giver_id, receiver_id in pairs:
+        if not Exclusion.query.filter_by(giver_id=giver_id, receiver_id=receiver_id).first():
+            db.session.add(Exclusion(giver_id=giver_id, receiver_id=receiver_id))
+    db.session.commit()
 
-            msg.attach(MIMEText(body, "plain"))
+    logger.info("Admin excluded %s -> %s (both ways: %s)", giver.email, receiver.email, both_ways)
+    suffix = " (and vice versa)" if both_ways else ""
+    flash(
+        f"{giver.name} will not draw {receiver.name}{suffix}. Re-create matches to apply.",
+        "success",
+    )
+    return redirect(url_for("main.admin_dashboard"))
 
-            # Send email
-            with smtplib.SMTP(
-                current_app.config["SMTP_SERVER"], current_app.config["SMTP_PORT"]
-            ) as server:
-                server.starttls()
-                server.login(
-                    current_app.config["SMTP_USERNAME"],
-                    current_app.config["SMTP_PASSWORD"],
-                )
-                server.send_message(msg)
 
-            # Mark as sent
-            match.thank_you_email_sent = True
-            logger.info(f"Sent thank you reminder to {receiver.email} revealing {giver.email}")
-            flash(
-                f"Marked as revealed and sent thank you reminder to {receiver.name}!",
-                "success",
-            )
+@main.route("/admin/exclusions/<int:exclusion_id>/delete", methods=["POST"])
+@admin_required
+def delete_exclusion(exclusion_id):
+    exclusion = Exclusion.query.get_or_404(exclusion_id)
+    db.session.delete(exclusion)
+    db.session.commit()
+    flash("Exclusion removed.", "success")
+    return redirect(url_for("main.admin_dashboard"))
 
-        except smtplib.SMTPException as e:
-            logger.error(f"Failed to send thank you email to {receiver.email}: {e}")
-            flash(
-                f"Marked as revealed but failed to send email to {receiver.name}. Error: {str(e)}",
-                "warning",
-            )
-        except Exception as e:
-            logger.error(f"Unexpected error sending thank you email to {receiver.email}: {e}")
-            flash(
-                f"Marked as revealed but failed to send email to {receiver.name}.",
-                "warning",
-            )
 
-    db.session.commit()
-    return redirect(url_for("main.reveal"))
+@main.route("/admin/import", methods=["POST"])
+@admin_required
+def import_roster():
+    # Imported participants are not spliced one by one; match them all at once afterwards
+    if current_phase() != REGISTRATION:
+        flash("Clear the existing matches before importing participants!", "error")
+        return redirect(url_for("main.admin_dashboard"))
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Choose a CSV or JSONL file to import!", "error")
+        return redirect(url_for("main.admin_dashboard"))
+
+    fmt = request.form.get("format") or detect_format(upload.filename)
+    if fmt not in IMPORT_FORMATS:
+        flash(f"Unsupported import format: {fmt}", "error")
+        return redirect(url_for("main.admin_dashboard"))
+
+    report = import_participants(open_text(upload.stream), fmt)
+
+    logger.info("Admin imported %s: %s", upload.filename, report.summary())
+    flash(report.summary(), "success" if report.inserted else "info")
+    for line, message in report.errors[:5]:
+        flash(f"Line {line}: {message}", "error")
+    return redirect(url_for("main.admin_dashboard"))
+
+
+EXPORTS = {"participants": export_participants, "matches": export_matches}
+
+
+@main.route("/admin/export/<kind>.<fmt>")
+@admin_required
+def export(kind, fmt):
+    if kind not in EXPORTS or fmt not in EXPORT_FORMATS:
+        abort(404)
+    logger.info("Admin exported %s as %s", kind, fmt)
+    return Response(
+        stream_with_context(EXPORTS[kind](fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=secretsanta-{kind}.{fmt}"},
+    )
+
+
+@main.route("/admin/metrics")
+@limiter.exempt  # Scraped every few seconds; the default per-IP limits would lock the scraper out
+def metrics_endpoint():
+    # Admins can open it in the browser; scrapers send the METRICS_TOKEN as a bearer token
+    token = current_app.config["METRICS_TOKEN"]
+    authorization = request.headers.get("Authorization", "")
+    # Compared as bytes: compare_digest rejects non-ASCII str with a TypeError
+    scraper = bool(token) and hmac.compare_digest(
+        authorization.encode(), f"Bearer {token}".encode()
+    )
+    if not scraper and not session.get("admin_authenticated"):
+        return redirect(url_for("main.admin_login"))
+
+    body = metrics.render_prometheus(metrics.registry.collect())
+    return Response(body, mimetype="text/plain; version=0.0.4")
 
 
 @main.route("/admin/delete-participant/<int:participant_id>", methods=["POST"])
@@ -459,34 +769,54 @@ def delete_participant(participant_id):
     participant = Participant.query.get_or_404(participant_id)
 
     # Check if emails have been sent
-    any_emails_sent = Match.query.filter_by(email_sent=True).first()
-    if any_emails_sent:
+    if current_phase() == LOCKED:
         flash("Cannot delete participants - emails have already been sent!", "error")
         return redirect(url_for("main.admin_dashboard"))
 
-    # Clear any matches involving this participant
-    Match.query.filter(
-        (Match.giver_id == participant_id) | (Match.receiver_id == participant_id)
+    # Drop queued emails for matches involving this participant, then close the gap
+    # in the cycle by joining their giver to their receiver
+    involved = (Match.giver_id == participant_id) | (Match.receiver_id == participant_id)
+    Outbox.query.filter(Outbox.match_id.in_(select(Match.id).where(involved))).delete(
+        synchronize_session=False
+    )
+    matches_kept = _splice_out(participant_id)
+    if matches_kept is False:
+        set_phase(REGISTRATION)
+    elif matches_kept:
+        pagecache.invalidate()
+    Exclusion.query.filter(
+        (Exclusion.giver_id == participant_id) | (Exclusion.receiver_id == participant_id)
     ).delete()
 
     db.session.delete(participant)
     db.session.commit()
 
-    logger.info(f"Admin deleted participant: {participant.email}")
-    flash(
-        f"Deleted participant: {participant.name}. Any matches involving this participant have been cleared.",
-        "success",
-    )
+    logger.info("Admin deleted participant: %s", participant.email)
+    if matches_kept is None:
+        flash(f"Deleted participant: {participant.name}.", "success")
+    elif matches_kept:
+        flash(
+            f"Deleted participant: {participant.name}. Their Secret Santa now gives to their receiver.",
+            "success",
+        )
+    else:
+        flash(
+            f"Deleted participant: {participant.name}. Matches have been cleared - please re-create them.",
+            "success",
+        )
     return redirect(url_for("main.admin_dashboard"))
 
 
 @main.route("/admin/reset-all", methods=["POST"])
 @admin_required
 def reset_all():
-    # Delete all matches and participants
+    # Delete all queued emails, matches, exclusions and participants
+    Outbox.query.delete()
     Match.query.delete()
+    Exclusion.query.delete()
     Participant.query.delete()
-    Settings.query.delete()
+    Settings.query.filter(Settings.key.not_in(PHASE_KEYS)).delete()
+    set_phase(REGISTRATION)
     db.session.commit()
 
     flash("All data has been reset!", "success")
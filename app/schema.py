@@ -0,0 +1,123 @@
+"""Schema versioning for existing SQLite databases.
+
+``db.create_all()`` creates missing tables but never changes tables that
+already exist, so anything added to an existing table (such as an index) needs
+a migration here. The applied version is kept in SQLite's ``PRAGMA
+user_version``; each migration is a list of SQL statements (or callables taking
+the connection) that must be safe to run against a database that
+``create_all()`` has just built from the current models.
+
+Starting the app only reads the version (``ensure_schema``); tables are created
+and migrations applied by ``migrate``, from ``flask --app app migrate`` or
+automatically when the version is behind and ``AUTO_MIGRATE`` is on. New tables
+therefore need a new schema version too.
+"""
+
+import logging
+
+from sqlalchemy import text
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(table, column, ddl):
+    """Migration step adding ``column`` unless ``create_all()`` already did."""
+
+    def step(connection):
+        columns = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+    return step
+
+
+MIGRATIONS = {
+    # 1: indexes for the columns routes and the email worker filter on
+    1: [
+        "CREATE INDEX IF NOT EXISTS ix_match_giver_id ON match (giver_id)",
+        "CREATE INDEX IF NOT EXISTS ix_match_receiver_id ON match (receiver_id)",
+        "CREATE INDEX IF NOT EXISTS ix_match_email_sent ON match (email_sent)",
+        "CREATE INDEX IF NOT EXISTS ix_match_revealed ON match (revealed)",
+        "CREATE INDEX IF NOT EXISTS ix_outbox_match_id ON outbox (match_id)",
+        "CREATE INDEX IF NOT EXISTS ix_exclusion_receiver_id ON exclusion (receiver_id)",
+    ],
+    # 2: retry scheduling for the email worker
+    2: [_add_column("outbox", "next_attempt_at", "DATETIME")],
+}
+
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+def get_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def _apply(connection, version):
+    for target in sorted(v for v in MIGRATIONS if v > version):
+        for statement in MIGRATIONS[target]:
+            if callable(statement):
+                statement(connection)
+            else:
+                connection.execute(text(statement))
+        # PRAGMA doesn't take bound parameters; target is always an int from MIGRATIONS
+        connection.execute(text(f"PRAGMA user_version = {int(target)}"))
+        logger.info("Migrated database schema to version %d", target)
+        version = target
+    return version
+
+
+def upgrade(engine):
+    """Apply pending migrations; returns the (new) schema version.
+
+    Databases other than SQLite are left to ``create_all()``.
+    """
+    if engine.dialect.name != "sqlite":
+        return None
+
+    with engine.begin() as connection:
+        return _apply(connection, get_version(connection))
+
+
+def migrate(engine):
+    """Create missing tables and apply pending migrations; returns the schema version.
+
+    SQLite's write lock is held throughout, so processes migrating at the same
+    time wait for each other instead of racing on ``CREATE TABLE``.
+    """
+    from app import models  # noqa: F401 - registers every table on db.metadata
+
+    if engine.dialect.name != "sqlite":
+        db.metadata.create_all(engine)
+        return None
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        db.metadata.create_all(connection)
+        version = _apply(connection, get_version(connection))
+        connection.commit()
+    return version
+
+
+def ensure_schema(engine, auto_migrate=True):
+    """Startup check: read the schema version and only migrate if it is behind.
+
+    With ``auto_migrate`` off, an outdated database is logged as an error and
+    left for ``flask --app app migrate``. Returns the version.
+    """
+    if engine.dialect.name != "sqlite":
+        return migrate(engine)
+
+    with engine.connect() as connection:
+        version = get_version(connection)
+    if version >= SCHEMA_VERSION:
+        return version
+    if not auto_migrate:
+        logger.error(
+            "Database schema is at version %d, expected %d. Run `flask --app app migrate`.",
+            version,
+            SCHEMA_VERSION,
+        )
+        return version
+    return migrate(engine)
@@ -0,0 +1,129 @@
+"""Mail transports: where the email worker hands finished messages.
+
+``MAIL_TRANSPORT`` picks one:
+
+- ``smtp`` (default): the pooled SMTP connections in ``app.mailer``
+- ``maildir`` / ``mbox``: write messages to ``MAIL_FILE_PATH`` for a dry run
+  that can be opened in any mail client
+- ``null``: accept and drop everything (rehearsals and benchmarks)
+- ``memory``: keep messages in a list (tests, benchmarks, previews)
+
+Every transport has ``send(msg)`` and ``close()`` and is safe to share
+between the delivery engine's threads.
+"""
+
+import mailbox
+import os
+import threading
+
+from app.database import data_directory
+from app.mailer import SMTPPool
+
+TRANSPORTS = ("smtp", "maildir", "mbox", "null", "memory")
+
+
+class NullTransport:
+    """Accepts every message and throws it away."""
+
+    def __init__(self):
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send(self, msg):
+        with self._lock:
+            self.sent += 1
+
+    def close(self):
+        pass
+
+
+class MemoryTransport:
+    """Keeps sent messages in ``messages`` for inspection."""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def send(self, msg):
+        with self._lock:
+            self.messages.append(msg)
+
+    def close(self):
+        pass
+
+
+class MaildirTransport:
+    """Writes each message as a file in a Maildir (created if missing)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._maildir = mailbox.Maildir(path, create=True)
+        self._lock = threading.Lock()
+
+    def send(self, msg):
+        with self._lock:
+            self._maildir.add(msg)
+
+    def close(self):
+        pass
+
+
+class MboxTransport:
+    """Appends messages to a single mbox file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._mbox = mailbox.mbox(path, create=True)
+        self._lock = threading.Lock()
+
+    def send(self, msg):
+        with self._lock:
+            self._mbox.lock()
+            try:
+                self._mbox.add(msg)
+                self._mbox.flush()
+            finally:
+                self._mbox.unlock()
+
+    def close(self):
+        with self._lock:
+            self._mbox.close()
+
+
+def _mail_path(config, kind):
+    """``MAIL_FILE_PATH``, or ``mail/`` / ``mail.mbox`` next to the database."""
+    if config.get("MAIL_FILE_PATH"):
+        return config["MAIL_FILE_PATH"]
+    directory = data_directory(config["SQLALCHEMY_DATABASE_URI"]) or "."
+    return os.path.join(directory, "mail" if kind == "maildir" else "mail.mbox")
+
+
+def create_transport(config, kind=None):
+    """Build the transport named by ``kind`` (default: ``MAIL_TRANSPORT``)."""
+    kind = kind or config.get("MAIL_TRANSPORT", "smtp")
+    if kind == "smtp":
+        return SMTPPool.from_config(config, size=config.get("SMTP_CONCURRENCY", 1))
+    if kind == "maildir":
+        return MaildirTransport(_mail_path(config, kind))
+    if kind == "mbox":
+        return MboxTransport(_mail_path(config, kind))
+    if kind == "null":
+        return NullTransport()
+    if kind == "memory":
+        return MemoryTransport()
+    raise ValueError(f"Unknown MAIL_TRANSPORT {kind!r}; expected one of {', '.join(TRANSPORTS)}")
+
+
+def get_transport(app):
+    """Return the process-wide transport for ``app``, creating it on first use."""
+    transport = app.extensions.get("mail_transport")
+    if transport is None:
+        transport = app.extensions["mail_transport"] = create_transport(app.config)
+    return transport
+
+
+def close_transport(app):
+    """Close and forget the process-wide transport for ``app``."""
+    transport = app.extensions.pop("mail_transport", None)
+    if transport is not None:
+        transport.close()
@@ -0,0 +1,44 @@
+MAX_NAME_LENGTH = 100
+MAX_GIFT_PREFERENCE_LENGTH = 500
+
+
+class InvalidRegistration(ValueError):
+    """A registration field failed validation; the message is shown to the user."""
+
+
+def validate_registration(name, email, gift_preference):
+    """Check one registration and return ``(name, normalized_email, gift_preference)``.
+
+    Shared by the registration form and the bulk importer so both apply the
+    same rules. Raises ``InvalidRegistration`` with a user-facing message.
+    """
+    # Imported JSON can hold numbers, lists or objects where text belongs
+    for label, value in (("Name", name), ("Email", email), ("Gift preferences", gift_preference)):
+        if value is not None and not isinstance(value, str):
+            raise InvalidRegistration(f"{label} must be text!")
+
+    name = (name or "").strip()
+    email = (email or "").strip()
+    gift_preference = (gift_preference or "").strip()
+
+    # Validate name
+    if not name:
+        raise InvalidRegistration("Name is required!")
+    if len(name) > MAX_NAME_LENGTH:
+        raise InvalidRegistration("Name is too long (maximum 100 characters)!")
+
+    # Validate email (email_validator is imported on first use; it's slow to load at startup)
+    from email_validator import EmailNotValidError, validate_email
+
+    if not email:
+        raise InvalidRegistration("Email is required!")
+    try:
+        email = validate_email(email, check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise InvalidRegistration(f"Invalid email address: {str(e)}") from e
+
+    # Validate gift preference length
+    if len(gift_preference) > MAX_GIFT_PREFERENCE_LENGTH:
+        raise InvalidRegistration("Gift preferences are too long (maximum 500 characters)!")
+
+    return name, email, gift_preference
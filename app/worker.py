@@ -0,0 +1,319 @@
+"""Background worker that delivers queued emails from the outbox.
+
+Run it as its own process next to gunicorn:
+
+    secretsanta-worker              # poll forever
+    secretsanta-worker --once       # send everything that is due and exit
+    secretsanta-worker --rehearse   # write every match email to data/mail/, change nothing
+
+Emails that fail with a temporary error (a throttled or unreachable relay) are
+retried with exponential backoff; permanent failures, or emails that run out of
+attempts, are marked "failed" and listed on the admin dashboard.
+
+A rehearsal (``--rehearse``) renders the match email for every existing match
+and hands it to a file or null transport without reading or updating the
+outbox, so it can run before "Send Emails" and as often as needed.
+
+Only one worker should run against a database at a time.
+"""
+
+import argparse
+import logging
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import create_app, db, metrics
+from app.delivery import DeliveryReport, get_engine, retry_delay
+from app.mailer import describe_smtp_error, is_transient, render_messages
+from app.models import Match, Outbox
+from app.transports import TRANSPORTS, close_transport, get_transport
+
+logger = logging.getLogger(__name__)
+
+# Delivery results are committed every CHECKPOINT_SIZE messages or CHECKPOINT_SECONDS,
+# whichever comes first; a crash can resend at most one checkpoint's worth
+CHECKPOINT_SIZE = 50
+CHECKPOINT_SECONDS = 1.0
+
+
+def recover_interrupted():
+    """Requeue rows left in "sending" by a worker that died mid-batch.
+
+    The interrupted try counts as an attempt, so a message that crashes the
+    worker every time ends up dead-lettered instead of being retried forever.
+    """
+    interrupted = Outbox.query.filter_by(status="sending")
+    exhausted = Outbox.attempts + 1 >= current_app.config["EMAIL_MAX_ATTEMPTS"]
+    failed = interrupted.filter(exhausted).update(
+        {
+            "status": "failed",
+            "attempts": Outbox.attempts + 1,
+            "last_error": "The worker stopped while sending this email",
+            "next_attempt_at": None,
+        },
+        synchronize_session=False,
+    )
+    count = interrupted.update(
+        {"status": "queued", "attempts": Outbox.attempts + 1}, synchronize_session=False
+    )
+    db.session.commit()
+    if count:
+        logger.warning("Requeued %d emails interrupted by a previous worker", count)
+    if failed:
+        logger.error("Gave up on %d emails that were interrupted on every attempt", failed)
+    return count
+
+
+def _record_results(results):
+    """Write delivery results in one transaction.
+
+    Each result is ``(row_id, kind, match_id, status, error, next_attempt_at)``;
+    ``status`` is "sent", "queued" (a temporary failure to retry at
+    ``next_attempt_at``) or "failed" (dead-lettered).
+    """
+    if not results:
+        return
+    outbox = Outbox.__table__
+    matches = Match.__table__
+    sent = [{"row_id": row_id} for row_id, _, _, status, _, _ in results if status == "sent"]
+    unsent = [
+        {"row_id": row_id, "status": status, "error": error, "next_attempt_at": next_attempt_at}
+        for row_id, _, _, status, error, next_attempt_at in results
+        if status != "sent"
+    ]
+    if sent:
+        db.session.execute(
+            outbox.update()
+            .where(outbox.c.id == db.bindparam("row_id"))
+            .values(
+                status="sent",
+                attempts=outbox.c.attempts + 1,
+                sent_at=datetime.utcnow(),
+                last_error=None,
+                next_attempt_at=None,
+            ),
+            sent,
+        )
+    if unsent:
+        db.session.execute(
+            outbox.update()
+            .where(outbox.c.id == db.bindparam("row_id"))
+            .values(
+                status=db.bindparam("status"),
+                attempts=outbox.c.attempts + 1,
+                last_error=db.bindparam("error"),
+                next_attempt_at=db.bindparam("next_attempt_at"),
+            ),
+            unsent,
+        )
+    for kind, flag in (("match", "email_sent"), ("thank_you", "thank_you_email_sent")):
+        match_ids = [
+            {"match_id": match_id}
+            for _, row_kind, match_id, status, _, _ in results
+            if status == "sent" and row_kind == kind
+        ]
+        if match_ids:
+            db.session.execute(
+                matches.update()
+                .where(matches.c.id == db.bindparam("match_id"))
+                .values({flag: True}),
+                match_ids,
+            )
+    db.session.commit()
+
+
+def _outcome(error, attempts, config):
+    """(status, next_attempt_at) for a message after its ``attempts``-th try."""
+    if error is None:
+        return "sent", None
+    if attempts < config["EMAIL_MAX_ATTEMPTS"] and is_transient(error):
+        delay = retry_delay(
+            attempts, config["EMAIL_RETRY_BASE_SECONDS"], config["EMAIL_RETRY_MAX_SECONDS"]
+        )
+        return "queued", datetime.utcnow() + timedelta(seconds=delay)
+    return "failed", None
+
+
+def deliver_pending(batch_size=100):
+    """Send up to ``batch_size`` due emails and return how many were processed.
+
+    Emails waiting for a retry are skipped until their ``next_attempt_at``.
+    """
+    now = datetime.utcnow()
+    rows = (
+        Outbox.query.options(
+            db.joinedload(Outbox.match).joinedload(Match.giver),
+            db.joinedload(Outbox.match).joinedload(Match.receiver),
+        )
+        .filter(
+            Outbox.status == "queued",
+            db.or_(Outbox.next_attempt_at.is_(None), Outbox.next_attempt_at <= now),
+        )
+        .order_by(Outbox.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not rows:
+        return 0
+
+    # Render every message while the rows are loaded, then work from plain tuples so
+    # the result checkpoints below don't expire and reload ORM objects
+    config = current_app.config
+    messages = render_messages(
+        ((row.id, row.kind, row.match) for row in rows),
+        config["SMTP_USERNAME"],
+        html=config["EMAIL_HTML"],
+    )
+    by_id = {row.id: (row.kind, row.match_id, row.attempts) for row in rows}
+    db.session.expunge_all()
+
+    # Claim the batch so a crash leaves a visible trail instead of silent duplicates
+    Outbox.query.filter(Outbox.id.in_(by_id)).update(
+        {"status": "sending"}, synchronize_session=False
+    )
+    db.session.commit()
+
+    engine = get_engine(current_app, get_transport(current_app))
+    report = DeliveryReport()
+
+    # Record results in small checkpoints so progress survives a crash mid-batch
+    # without paying for a commit per message
+    done = []
+    last_checkpoint = time.monotonic()
+    for row_id, error in engine.run(messages):
+        kind, match_id, attempts = by_id[row_id]
+        status, next_attempt_at = _outcome(error, attempts + 1, config)
+        report.record(error, retry=status == "queued")
+        metrics.inc(
+            "secretsanta_emails_total",
+            kind=kind,
+            status={"queued": "retry"}.get(status, status),
+        )
+        if status == "queued":
+            logger.warning(
+                "Temporary failure sending %s email for match %s (attempt %d), retrying at %s: %s",
+                kind,
+                match_id,
+                attempts + 1,
+                next_attempt_at,
+                error,
+            )
+        elif status == "failed":
+            logger.error("Failed to send %s email for match %s: %s", kind, match_id, error)
+        description = describe_smtp_error(error) if error is not None else None
+        done.append((row_id, kind, match_id, status, description, next_attempt_at))
+        if len(done) >= CHECKPOINT_SIZE or time.monotonic() - last_checkpoint > CHECKPOINT_SECONDS:
+            _record_results(done)
+            done = []
+            last_checkpoint = time.monotonic()
+    _record_results(done)
+
+    logger.info(report.summary())
+    return len(rows)
+
+
+def rehearse(batch_size=100):
+    """Send every match email through the transport without queuing or marking anything.
+
+    Returns the ``DeliveryReport``; nothing is written to the database.
+    """
+    config = current_app.config
+    engine = get_engine(current_app, get_transport(current_app))
+    report = DeliveryReport()
+    last_id = 0
+    while True:
+        matches = (
+            Match.with_participants()
+            .filter(Match.id > last_id)
+            .order_by(Match.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not matches:
+            break
+        last_id = matches[-1].id
+        messages = render_messages(
+            ((match.id, "match", match) for match in matches),
+            config["SMTP_USERNAME"],
+            html=config["EMAIL_HTML"],
+        )
+        db.session.expunge_all()
+        for match_id, error in engine.run(messages):
+            report.record(error)
+            if error is not None:
+                logger.error("Rehearsal of match %s email failed: %s", match_id, error)
+    db.session.rollback()
+    return report
+
+
+def run(app, interval=2.0, batch_size=100, once=False, stop_event=None):
+    """Drain the outbox, polling every ``interval`` seconds until stopped."""
+    stop_event = stop_event or threading.Event()
+
+    with app.app_context():
+        recover_interrupted()
+        while not stop_event.is_set():
+            processed = deliver_pending(batch_size)
+            if processed:
+                continue
+            if once:
+                break
+            stop_event.wait(interval)
+        close_transport(app)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deliver queued Secret Santa emails.")
+    parser.add_argument(
+        "--interval", type=float, default=2.0, help="seconds between polls (default 2)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="emails claimed per batch (default 100)"
+    )
+    parser.add_argument("--once", action="store_true", help="send everything that is due and exit")
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        help="override MAIL_TRANSPORT (queued emails are still marked as sent)",
+    )
+    parser.add_argument(
+        "--rehearse",
+        action="store_true",
+        help="render every match email into the transport (default maildir) and exit, "
+        "without queuing or marking anything",
+    )
+    args = parser.parse_args(argv)
+    if args.rehearse and args.transport == "smtp":
+        parser.error("--rehearse would email every participant; use maildir, mbox or null")
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    app = create_app()
+    if args.rehearse:
+        app.config["MAIL_TRANSPORT"] = args.transport or "maildir"
+        with app.app_context():
+            report = rehearse(args.batch_size)
+            close_transport(app)
+        logger.info("Rehearsal (%s): %s", app.config["MAIL_TRANSPORT"], report.summary())
+        return
+    if args.transport:
+        app.config["MAIL_TRANSPORT"] = args.transport
+    logger.info("Email worker started (transport: %s)", app.config["MAIL_TRANSPORT"])
+    run(
+        app,
+        interval=args.interval,
+        batch_size=args.batch_size,
+        once=args.once,
+        stop_event=stop_event,
+    )
+    logger.info("Email worker stopped")
+
+
+if __name__ == "__main__":
+    main()
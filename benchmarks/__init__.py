@@ -0,0 +1,10 @@
+"""
+Benchmarks for Secret Santa Bot.
+
+Run from the project root:
+    python -m benchmarks                              # full suite, results as JSON
+    python -m benchmarks --sizes 10,1000,100000 --output results.json
+    python -m benchmarks --compare baseline.json       # flag regressions
+    python -m benchmarks.register_load                # concurrent /register load only
+    python -m benchmarks.query_plans                  # SQLite query plans for hot queries
+"""
@@ -0,0 +1,63 @@
+"""Shared helpers: building a quiet app for a throwaway database, timing, run metadata."""
+
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+
+
+def make_app(database_path, env=None):
+    """Build an app for benchmarking: CSRF and rate limits off, quiet logs."""
+    os.environ.update(env or {})
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+
+    from app import create_app, limiter
+
+    logging.disable(logging.WARNING)
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    limiter.enabled = False
+    return app
+
+
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["admin_authenticated"] = True
+    return client
+
+
+def timed(func, repeat=1):
+    """Run ``func`` ``repeat`` times and return (median seconds, last result)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def run_metadata():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision,
+        "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Bytes sent per page view, before and after moving the CSS out of base.html.
+
+Builds the static assets (as a deployment would) in a copy of the static folder,
+so the checkout's app/static/dist is left alone, then fetches the main pages
+of a small event through the Flask test client. For each page it reports:
+
+- inline: HTML plus the stylesheet, uncompressed - what every view cost when
+  the CSS was inlined in base.html
+- first_view: HTML plus the precompressed stylesheet, with COMPRESS_HTML on (pages
+  with a CSRF token and admin pages are still sent uncompressed)
+- repeat_view: HTML only, the stylesheet being cached as immutable
+
+The Pico stylesheet comes from a CDN and is the same either way, so it isn't counted.
+
+Usage (from project root):
+    python -m benchmarks.page_weight
+    python -m benchmarks.page_weight --participants 200 --json
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from benchmarks.common import admin_client, make_app
+from benchmarks.synthetic import populate
+
+PAGES = ("/", "/register", "/admin/login", "/admin/dashboard", "/reveal")
+GZIP = {"Accept-Encoding": "gzip, br"}
+
+
+def _stylesheets(html):
+    return re.findall(r'<link rel="stylesheet" href="(/static/[^"]+)"', html)
+
+
+def run_page_weight(participants=50):
+    from app.assets import DIST_DIR, build_assets
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "weight.db")
+        app = make_app(database_path, {"METRICS_DIR": "", "COMPRESS_HTML": "True"})
+        static_folder = os.path.join(tmp, "static")
+        shutil.copytree(app.static_folder, static_folder, ignore=shutil.ignore_patterns(DIST_DIR))
+        build_assets(static_folder)
+        app.static_folder = static_folder
+        populate(database_path, participants)
+        client = admin_client(app)
+        client.post("/admin/create-matches")
+
+        results = {}
+        for page in PAGES:
+            plain = client.get(page)
+            compressed = client.get(page, headers=GZIP)
+            sheets = _stylesheets(plain.get_data(as_text=True))
+            css_plain = sum(len(client.get(href).data) for href in sheets)
+            css_compressed = sum(len(client.get(href, headers=GZIP).data) for href in sheets)
+            html_plain = len(plain.data)
+            html_compressed = len(compressed.data)
+            results[page] = {
+                "inline": html_plain + css_plain,
+                "first_view": html_compressed + css_compressed,
+                "repeat_view": html_compressed,
+                "saved": round(1 - html_compressed / (html_plain + css_plain), 3),
+            }
+
+        with app.app_context():
+            from app import db
+
+            db.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--participants", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run_page_weight(args.participants)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for page, r in results.items():
+        print(
+            f"{page:>17}: inline {r['inline']:7d} B  first view {r['first_view']:7d} B  "
+            f"repeat view {r['repeat_view']:7d} B  ({r['saved']:.0%} less per repeat view)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Show SQLite query plans and timings for the hot Match/Outbox queries,
+before and after the schema migration that adds their indexes.
+
+Builds a throwaway database with the current models, removes the indexes
+to mimic a database created by an older version, fills it with synthetic
+participants and matches, then runs app.schema.upgrade() on it.
+
+Usage (from project root):
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --participants 50000 --repeat 200
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+HOT_QUERIES = {
+    "splice: match by giver": "SELECT id FROM match WHERE giver_id = :participant LIMIT 1",
+    "splice: match by receiver": "SELECT id FROM match WHERE receiver_id = :participant LIMIT 1",
+    "phase: any email sent": "SELECT id FROM match WHERE email_sent = 1 LIMIT 1",
+    "send: unqueued matches": (
+        "SELECT count(*) FROM match WHERE email_sent = 0 "
+        "AND id NOT IN (SELECT match_id FROM outbox WHERE kind = 'match')"
+    ),
+    "reveal: revealed count": "SELECT count(*) FROM match WHERE revealed = 1",
+    "delete: outbox by match": "SELECT id FROM outbox WHERE match_id = :match",
+}
+
+
+def build_database(path, participants):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from app import create_app, db
+    from app.schema import MIGRATIONS
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+
+    conn = sqlite3.connect(path)
+    # Mimic a database created before the indexes existed
+    for statement in MIGRATIONS[1]:
+        index_name = statement.split("EXISTS ")[1].split(" ")[0]
+        conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+    conn.execute("PRAGMA user_version = 0")
+
+    conn.executemany(
+        "INSERT INTO participant (id, name, email) VALUES (?, ?, ?)",
+        ((i, f"Participant {i}", f"p{i}@example.com") for i in range(1, participants + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO match (giver_id, receiver_id, email_sent, revealed, thank_you_email_sent) "
+        "VALUES (?, ?, 0, 0, 0)",
+        ((i, i % participants + 1) for i in range(1, participants + 1)),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn, engine
+
+
+def measure(conn, participants, repeat):
+    params = {"participant": participants // 2, "match": participants // 2}
+    results = {}
+    for name, sql in HOT_QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+        results[name] = (plan, elapsed_ms)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--participants", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn, engine = build_database(path, args.participants)
+
+        before = measure(conn, args.participants, args.repeat)
+
+        from app.schema import upgrade
+
+        version = upgrade(engine)
+        engine.dispose()
+        conn.execute("ANALYZE")
+        after = measure(conn, args.participants, args.repeat)
+        conn.close()
+
+    print(f"\n{args.participants} participants, schema upgraded to version {version}\n")
+    for name in HOT_QUERIES:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        print(f"{name}")
+        print(f"  before: {ms_before:8.3f} ms  {' / '.join(plan_before)}")
+        print(f"  after:  {ms_after:8.3f} ms  {' / '.join(plan_after)}")
+
+
+if __name__ == "__main__":
+    main()
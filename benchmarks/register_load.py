@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Concurrent /register load test against a shared SQLite file.
+
+Each worker process builds its own app (like a gunicorn worker) and posts
+registrations as fast as it can through the Flask test client, from
+``--threads`` threads (like gunicorn ``--threads``). The run is repeated for
+each SQLite tuning profile so write throughput and lock errors can be
+compared; the ``*-group`` profiles turn on registration group commit, which
+needs several threads per worker to have anything to group.
+
+Usage (from project root):
+    python -m benchmarks.register_load
+    python -m benchmarks.register_load --workers 4 --requests 300 --json
+    python -m benchmarks.register_load --workers 2 --threads 8 --profiles durable,durable-group
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import make_app
+
+PROFILES = {
+    # SQLite defaults the app used before connection tuning existed
+    "legacy": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_MMAP_SIZE": "0",
+    },
+    # The app's defaults
+    "tuned": {
+        "SQLITE_JOURNAL_MODE": "WAL",
+        "SQLITE_SYNCHRONOUS": "NORMAL",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_MMAP_SIZE": str(64 * 1024 * 1024),
+    },
+    # Every commit synced to disk, as with SQLITE_SYNCHRONOUS=FULL in production
+    "durable": {
+        "SQLITE_JOURNAL_MODE": "WAL",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_MMAP_SIZE": str(64 * 1024 * 1024),
+    },
+}
+# Same settings with concurrent signups committed together within 5ms
+for _name in ("tuned", "durable"):
+    PROFILES[f"{_name}-group"] = {**PROFILES[_name], "REGISTER_GROUP_COMMIT_MS": "5"}
+
+
+def _register_worker(worker_id, database_path, env, requests, threads, barrier, results):
+    app = make_app(database_path, env)
+    latencies = []
+    errors = []
+
+    def post_registrations(thread_id):
+        client = app.test_client()
+        thread_latencies = []
+        thread_errors = 0
+        for i in range(requests):
+            start = time.perf_counter()
+            response = client.post(
+                "/register",
+                data={
+                    "name": f"Load {worker_id}-{thread_id}-{i}",
+                    "email": f"load{worker_id}x{thread_id}x{i}@example.com",
+                },
+            )
+            thread_latencies.append(time.perf_counter() - start)
+            if response.status_code != 302:
+                thread_errors += 1
+        latencies.extend(thread_latencies)
+        errors.append(thread_errors)
+
+    pool = [
+        threading.Thread(target=post_registrations, args=(thread_id,))
+        for thread_id in range(threads)
+    ]
+    barrier.wait()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, sum(errors)))
+
+
+def run_profile(name, workers, requests, threads=1):
+    env = PROFILES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "load.db")
+        # Migrate up front so the timed workers only read the schema version
+        make_app(database_path, env)
+
+        ctx = multiprocessing.get_context("spawn")
+        barrier = ctx.Barrier(workers + 1)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(
+                target=_register_worker,
+                args=(i, database_path, env, requests, threads, barrier, results),
+            )
+            for i in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        barrier.wait()
+        start = time.perf_counter()
+        collected = [results.get() for _ in procs]
+        elapsed = time.perf_counter() - start
+        for proc in procs:
+            proc.join()
+
+    latencies = sorted(lat for worker_latencies, _ in collected for lat in worker_latencies)
+    errors = sum(err for _, err in collected)
+    total = len(latencies)
+    return {
+        "profile": name,
+        "workers": workers,
+        "threads": threads,
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "signups_per_second": round((total - errors) / elapsed, 1),
+        "p50_ms": round(latencies[total // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(total - 1, int(total * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=1, help="request threads per worker")
+    parser.add_argument("--requests", type=int, default=200, help="registrations per worker thread")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        run_profile(name, args.workers, args.requests, args.threads)
+        for name in args.profiles.split(",")
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(
+            f"{r['profile']:>13}: {r['signups_per_second']:8.1f} signups/s  "
+            f"p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+            f"errors {r['errors']}/{r['requests']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""A minimal local SMTP server that accepts and discards everything.
+
+Lets the email worker be benchmarked without a real relay. It speaks just
+enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+"""
+
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 sink ready")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    self.server.messages += 1
+                    self.reply("250 queued")
+                continue
+
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-sink\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif command.startswith("AUTH"):
+                self.reply("235 authenticated")
+            elif command.startswith("DATA"):
+                in_data = True
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Counts connections and messages; use as a context manager."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.connections = 0
+        self.messages = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def env(self):
+        """Settings that point the app's mailer at this sink."""
+        return {
+            "SMTP_SERVER": self.server_address[0],
+            "SMTP_PORT": str(self.port),
+            "SMTP_STARTTLS": "False",
+            "SMTP_USERNAME": "bench@example.com",
+            "SMTP_PASSWORD": "bench",
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of an app process: importing the app, create_app() and the first request.
+
+Every sample runs in a fresh interpreter, like a new gunicorn worker or an
+autoscaled container. Most samples use a database that is already migrated
+(the normal case). One run against an empty database shows what the first
+boot pays for creating tables and migrating.
+
+Usage (from project root):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import PROJECT_ROOT
+
+# Runs inside the fresh interpreter and reports its own timings as JSON
+PROBE = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get("/register")
+done = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "create_app": created - imported,
+    "first_request": done - created,
+    "status": response.status_code,
+}))
+"""
+
+
+def _sample(database_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "SECRET_KEY": "benchmark",
+        "METRICS_DIR": "",
+    }
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if result.pop("status") != 200:
+        raise RuntimeError("First request to /register failed")
+    result["process_total"] = time.perf_counter() - start
+    return result
+
+
+def _summarise(samples):
+    return {
+        f"{name}_ms": round(statistics.median(s[name] for s in samples) * 1000, 1)
+        for name in ("import", "create_app", "first_request", "process_total")
+    }
+
+
+def run_startup(runs=5):
+    """Median startup timings for a migrated database, plus one first boot."""
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "startup.db")
+        first_boot = _sample(database_path)
+        samples = [_sample(database_path) for _ in range(runs)]
+    return {"runs": runs, "migrated": _summarise(samples), "first_boot": _summarise([first_boot])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes to time")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run_startup(args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name in ("migrated", "first_boot"):
+        r = results[name]
+        print(
+            f"{name:>10}: import {r['import_ms']:7.1f} ms  create_app {r['create_app_ms']:7.1f} ms  "
+            f"first request {r['first_request_ms']:7.1f} ms  process {r['process_total_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite: matching, admin pages, email fan-out and registration load.
+
+For each event size a fresh SQLite database is filled with synthetic
+participants, then the admin flow is timed through the Flask test client:
+create_matches, admin_dashboard, reveal (fresh, cached and 304) and
+send_emails, then rendering the emails from their templates and the email
+worker delivering the queued messages to a local SMTP sink. Bytes per page
+view, cold-start time and a
+concurrent /register load test run once at the end. Results are printed
+(or written) as JSON; --compare flags regressions against an earlier run.
+
+Usage (from project root):
+    python -m benchmarks
+    python -m benchmarks --sizes 10,1000,100000,1000000 --output results.json
+    python -m benchmarks --compare results.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from app.transports import TRANSPORTS
+from benchmarks.common import admin_client, make_app, run_metadata, timed
+from benchmarks.smtp_sink import SMTPSink
+from benchmarks.synthetic import populate
+
+DEFAULT_SIZES = "10,1000,10000,100000"
+# Timings below this are too noisy to call a regression
+NOISE_FLOOR_SECONDS = 0.005
+
+
+class StatementCounter:
+    """Counts SQL statements run on the app's engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _measure(counter, func, repeat=1):
+    before = counter.count
+    seconds, result = timed(func, repeat)
+    return {"seconds": round(seconds, 4), "statements": (counter.count - before) // repeat}, result
+
+
+def _expect(response, status, what):
+    if response.status_code != status:
+        raise RuntimeError(f"{what} returned {response.status_code}, expected {status}")
+    return response
+
+
+def bench_event(size, household_size, email_limit, repeat, sink, transport="smtp"):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "bench.db")
+        app = make_app(
+            database_path,
+            {
+                **sink.env(),
+                "MAIL_TRANSPORT": transport,
+                "SQL_QUERY_COUNTER": "False",
+                "METRICS_DIR": "",
+            },
+        )
+        start = time.perf_counter()
+        populate(database_path, size, household_size)
+        result = {"participants": size, "populate_seconds": round(time.perf_counter() - start, 3)}
+
+        from app import db, pagecache
+        from app.mailer import render_messages
+        from app.models import Match
+        from app.transports import close_transport
+        from app.worker import deliver_pending
+
+        with app.app_context():
+            counter = StatementCounter(db.engine)
+        client = admin_client(app)
+
+        result["create_matches"], _ = _measure(
+            counter,
+            lambda: _expect(client.post("/admin/create-matches"), 302, "create_matches"),
+        )
+        with app.app_context():
+            matches = db.session.query(Match).count()
+        if matches != size:
+            raise RuntimeError(f"create_matches made {matches} matches for {size} participants")
+
+        result["admin_dashboard"], response = _measure(
+            counter, lambda: _expect(client.get("/admin/dashboard"), 200, "dashboard"), repeat
+        )
+        result["admin_dashboard"]["bytes"] = len(response.data)
+
+        # reveal renders the table from scratch each time (as every view did before the
+        # fragment cache); reveal_cached reuses it and reveal_not_modified is a 304
+        def reveal_uncached():
+            pagecache._fragments.clear()
+            return _expect(client.get("/reveal"), 200, "reveal")
+
+        result["reveal"], response = _measure(counter, reveal_uncached, repeat)
+        result["reveal"]["bytes"] = len(response.data)
+        result["reveal_cached"], _ = _measure(
+            counter, lambda: _expect(client.get("/reveal"), 200, "reveal"), repeat
+        )
+        etag = {"If-None-Match": response.headers["ETag"]}
+        result["reveal_not_modified"], _ = _measure(
+            counter, lambda: _expect(client.get("/reveal", headers=etag), 304, "reveal"), repeat
+        )
+
+        result["send_emails"], _ = _measure(
+            counter, lambda: _expect(client.post("/admin/send-emails"), 302, "send_emails")
+        )
+
+        # Render up to email_limit messages on their own so template cost shows apart from delivery
+        with app.app_context():
+            sample = [(m.id, "match", m) for m in Match.with_participants().limit(email_limit)]
+            for name, html in (("render_emails", False), ("render_emails_html", True)):
+                seconds, _ = timed(
+                    lambda html=html: render_messages(sample, "bench@example.com", html=html),
+                    repeat,
+                )
+                result[name] = {
+                    "messages": len(sample),
+                    "seconds": round(seconds, 4),
+                    "per_second": round(len(sample) / seconds, 1) if seconds else None,
+                }
+
+        # Drain up to email_limit queued messages through the worker (into the sink for smtp)
+        start = time.perf_counter()
+        with app.app_context():
+            delivered = 0
+            while delivered < min(size, email_limit):
+                processed = deliver_pending(batch_size=min(100, email_limit - delivered))
+                if not processed:
+                    break
+                delivered += processed
+            close_transport(app)
+        elapsed = time.perf_counter() - start
+        result["email_delivery"] = {
+            "transport": transport,
+            "messages": delivered,
+            "seconds": round(elapsed, 4),
+            "per_second": round(delivered / elapsed, 1) if elapsed else None,
+        }
+
+        with app.app_context():
+            db.engine.dispose()
+        return result
+
+
+def compare(current, baseline, threshold):
+    """Return human-readable regressions of ``current`` against ``baseline``."""
+    regressions = []
+    previous = {run["participants"]: run for run in baseline.get("events", [])}
+    for run in current["events"]:
+        old = previous.get(run["participants"])
+        if not old:
+            continue
+        for name, value in run.items():
+            if not isinstance(value, dict) or "seconds" not in value or name not in old:
+                continue
+            before, after = old[name]["seconds"], value["seconds"]
+            if after > NOISE_FLOOR_SECONDS and after > before * (1 + threshold):
+                regressions.append(
+                    f"{run['participants']:>8} participants  {name}: "
+                    f"{before:.4f}s -> {after:.4f}s ({after / max(before, 1e-9):.2f}x)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated event sizes")
+    parser.add_argument(
+        "--households", type=int, default=0, help="group people into households of this size"
+    )
+    parser.add_argument(
+        "--email-limit", type=int, default=2000, help="max emails delivered per event"
+    )
+    parser.add_argument(
+        "--transport",
+        default="smtp",
+        choices=TRANSPORTS,
+        help="mail transport for delivery (smtp goes to a local sink)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page timing (median)")
+    parser.add_argument("--load-workers", type=int, default=4)
+    parser.add_argument("--load-requests", type=int, default=200, help="registrations per worker")
+    parser.add_argument("--skip-load", action="store_true", help="skip the /register load test")
+    parser.add_argument(
+        "--startup-runs", type=int, default=5, help="fresh processes timed for startup (0 skips)"
+    )
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio")
+    args = parser.parse_args(argv)
+
+    results = {"meta": run_metadata(), "events": []}
+    with SMTPSink() as sink:
+        for size in (int(s) for s in args.sizes.split(",")):
+            print(f"Benchmarking {size} participants...", file=sys.stderr)
+            results["events"].append(
+                bench_event(
+                    size, args.households, args.email_limit, args.repeat, sink, args.transport
+                )
+            )
+
+    from benchmarks.page_weight import run_page_weight
+
+    print("Measuring page weight...", file=sys.stderr)
+    results["page_weight"] = run_page_weight()
+
+    if args.startup_runs:
+        from benchmarks.startup import run_startup
+
+        print("Timing startup...", file=sys.stderr)
+        results["startup"] = run_startup(args.startup_runs)
+
+    if not args.skip_load:
+        from benchmarks.register_load import run_profile
+
+        print("Running /register load test...", file=sys.stderr)
+        results["register_load"] = run_profile("tuned", args.load_workers, args.load_requests)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
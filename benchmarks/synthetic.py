@@ -0,0 +1,48 @@
+"""Synthetic events: participants (and optionally household exclusions) written straight to SQLite."""
+
+import itertools
+import sqlite3
+
+# Rows per executemany call
+CHUNK_SIZE = 50_000
+
+
+def _chunks(rows):
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, CHUNK_SIZE)):
+        yield chunk
+
+
+def populate(database_path, participants, household_size=0):
+    """Add ``participants`` people to an app database that already has its schema.
+
+    With ``household_size`` > 1, consecutive people are grouped into
+    households whose members must not draw each other.
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        for chunk in _chunks(
+            (i, f"Participant {i}", f"participant{i}@example.com", "Books or socks")
+            for i in range(1, participants + 1)
+        ):
+            conn.executemany(
+                "INSERT INTO participant (id, name, email, gift_preference, created_at) "
+                "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                chunk,
+            )
+
+        if household_size > 1:
+            pairs = (
+                (giver, receiver)
+                for start in range(1, participants + 1, household_size)
+                for giver in range(start, min(start + household_size, participants + 1))
+                for receiver in range(start, min(start + household_size, participants + 1))
+                if giver != receiver
+            )
+            for chunk in _chunks(pairs):
+                conn.executemany(
+                    "INSERT INTO exclusion (giver_id, receiver_id) VALUES (?, ?)", chunk
+                )
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,199 @@
+import itertools
+import random
+
+import pytest
+
+from app import matching
+from app.matching import (
+    MatchingError,
+    NoValidCycleError,
+    choose_bridge_node,
+    choose_splice_edge,
+    cycle_pairs,
+    exclusions_for_groups,
+    find_cycle,
+)
+
+
+def assert_valid_cycle(order, ids, excluded=()):
+    """One cycle through everyone, with no excluded edge."""
+    assert len(order) == len(ids)
+    assert set(order) == set(ids)
+    forbidden = set(excluded)
+    assert not [pair for pair in cycle_pairs(order) if pair in forbidden]
+
+
+def households(n, size):
+    return [range(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def only_cycle(cycle):
+    """Exclude every edge except those of ``cycle``."""
+    allowed = set(cycle_pairs(cycle))
+    return {pair for pair in itertools.permutations(cycle, 2) if pair not in allowed}
+
+
+def test_cycle_pairs_wraps_around():
+    assert list(cycle_pairs([1, 2, 3])) == [(1, 2), (2, 3), (3, 1)]
+
+
+def test_exclusions_for_groups_covers_both_directions():
+    assert set(exclusions_for_groups([[1, 2], [3]])) == {(1, 2), (2, 1)}
+
+
+@pytest.mark.parametrize("n", [2, 3, 10, 500])
+def test_find_cycle_without_exclusions(n):
+    ids = list(range(n))
+    assert_valid_cycle(find_cycle(ids, rng=random.Random(n)), ids)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_cycle_avoids_household_exclusions(seed):
+    ids = list(range(5000))
+    excluded = list(exclusions_for_groups(households(len(ids), 4)))
+    order = find_cycle(ids, excluded, rng=random.Random(seed))
+    assert_valid_cycle(order, ids, excluded)
+
+
+def test_find_cycle_is_repeatable_with_a_seeded_rng():
+    ids = list(range(50))
+    excluded = list(exclusions_for_groups(households(len(ids), 3)))
+    first = find_cycle(ids, excluded, rng=random.Random(7))
+    assert find_cycle(ids, excluded, rng=random.Random(7)) == first
+
+
+def test_find_cycle_ignores_self_and_unknown_exclusions():
+    ids = [1, 2]
+    excluded = [(1, 1), (1, 3), (3, 2)]
+    assert_valid_cycle(find_cycle(ids, excluded, rng=random.Random(0)), ids)
+
+
+def test_find_cycle_falls_back_to_exhaustive_search():
+    cycle = [4, 1, 6, 3, 5, 2]
+    excluded = only_cycle(cycle)
+    # One repair step can't untangle a shuffle, so the backtracking search has to
+    order = find_cycle(sorted(cycle), excluded, rng=random.Random(0), repair_steps=1)
+    assert_valid_cycle(order, cycle, excluded)
+    start = order.index(cycle[0])
+    assert order[start:] + order[:start] == cycle
+
+
+@pytest.mark.parametrize("ids", [[], [1]])
+def test_find_cycle_needs_two_participants(ids):
+    with pytest.raises(NoValidCycleError):
+        find_cycle(ids)
+
+
+def test_find_cycle_rejects_duplicate_ids():
+    with pytest.raises(ValueError):
+        find_cycle([1, 2, 2])
+
+
+def test_find_cycle_rejects_someone_who_cannot_give():
+    excluded = [(1, 2), (1, 3)]
+    with pytest.raises(NoValidCycleError, match="giving"):
+        find_cycle([1, 2, 3], excluded)
+
+
+def test_find_cycle_rejects_someone_who_cannot_receive():
+    excluded = [(2, 1), (3, 1)]
+    with pytest.raises(NoValidCycleError, match="receiving"):
+        find_cycle([1, 2, 3], excluded)
+
+
+def test_find_cycle_proves_an_infeasible_event():
+    # Everyone can give and receive, but only as two separate pairs
+    ids = [1, 2, 3, 4]
+    allowed = {(1, 2), (2, 1), (3, 4), (4, 3)}
+    excluded = [pair for pair in itertools.permutations(ids, 2) if pair not in allowed]
+    with pytest.raises(NoValidCycleError):
+        find_cycle(ids, excluded, rng=random.Random(0))
+
+
+def test_find_cycle_gives_up_on_large_infeasible_events(monkeypatch):
+    monkeypatch.setattr(matching, "EXACT_SEARCH_LIMIT", 3)
+    ids = [1, 2, 3, 4]
+    excluded = [(1, 3), (1, 4), (2, 3), (2, 4), (3, 1), (3, 2), (4, 1), (4, 2)]
+    with pytest.raises(MatchingError) as excinfo:
+        find_cycle(ids, excluded, rng=random.Random(0), repair_steps=50)
+    assert not isinstance(excinfo.value, NoValidCycleError)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_repair_fixes_every_excluded_edge(seed):
+    ids = list(range(300))
+    forbidden = set(exclusions_for_groups(households(len(ids), 5)))
+    order = matching._repair(ids, forbidden, random.Random(seed), 100_000)
+    assert_valid_cycle(order, ids, forbidden)
+
+
+def test_repair_leaves_its_input_alone():
+    ids = list(range(20))
+    matching._repair(ids, {(0, 1)}, random.Random(0), 1000)
+    assert ids == list(range(20))
+
+
+def test_repair_returns_none_when_out_of_steps():
+    ids = [1, 2, 3, 4]
+    forbidden = {(1, 3), (1, 4), (2, 3), (2, 4), (3, 1), (3, 2), (4, 1), (4, 2)}
+    assert matching._repair(ids, forbidden, random.Random(0), 100) is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_search_finds_the_only_cycle(seed):
+    cycle = list(range(8))
+    random.Random(seed).shuffle(cycle)
+    forbidden = only_cycle(cycle)
+    order = matching._search(sorted(cycle), forbidden, random.Random(seed))
+    assert_valid_cycle(order, cycle, forbidden)
+
+
+def test_search_raises_when_no_cycle_exists():
+    ids = [1, 2, 3, 4]
+    forbidden = {(1, 3), (1, 4), (2, 3), (2, 4), (3, 1), (3, 2), (4, 1), (4, 2)}
+    with pytest.raises(NoValidCycleError):
+        matching._search(ids, forbidden, random.Random(0))
+
+
+def test_search_stops_at_its_budget(monkeypatch):
+    monkeypatch.setattr(matching, "EXACT_SEARCH_BUDGET", 3)
+    with pytest.raises(MatchingError) as excinfo:
+        matching._search(list(range(8)), set(), random.Random(0))
+    assert not isinstance(excinfo.value, NoValidCycleError)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_choose_splice_edge_keeps_the_cycle_valid(seed):
+    rng = random.Random(seed)
+    order = list(range(10))
+    new_id = 10
+    excluded = [(giver, new_id) for giver in range(0, 10, 2)] + [(new_id, 3), (new_id, 7)]
+    giver, receiver = choose_splice_edge(cycle_pairs(order), new_id, excluded, rng=rng)
+    assert (giver, receiver) in set(cycle_pairs(order))
+
+    spliced = order[: order.index(giver) + 1] + [new_id] + order[order.index(giver) + 1 :]
+    assert_valid_cycle(spliced, [*order, new_id], excluded)
+
+
+def test_choose_splice_edge_raises_when_nothing_fits():
+    edges = [(1, 2), (2, 1)]
+    with pytest.raises(MatchingError):
+        choose_splice_edge(edges, 3, [(1, 3), (3, 1)])
+
+
+def test_choose_bridge_node_returns_the_first_run_that_fits():
+    candidates = [
+        (5, 1, 6),  # node is the giver
+        (6, 7, 6),  # moving 7 would leave 6 -> 6
+        (8, 9, 10),  # 9 can't give to the receiver
+        (10, 11, 12),  # 10 -> 12 is excluded
+        (12, 13, 14),
+        (14, 15, 16),
+    ]
+    excluded = [(9, 2), (10, 12)]
+    assert choose_bridge_node(1, 2, candidates, excluded) == (12, 13, 14)
+
+
+def test_choose_bridge_node_raises_when_no_run_fits():
+    with pytest.raises(MatchingError):
+        choose_bridge_node(1, 2, [(3, 4, 5)], [(1, 4)])